@@ -18,12 +18,19 @@
 # from tools.iyp.iyp_aux import *
 # from tools.peeringdb.peeringdb_aux import *
 
-import pybgpstream
+import os
+import numpy as np
 import networkx as nx
-from itertools import groupby
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 import time
 import json
 import pickle
+from datasets.collector_registry import get_collector_registry, live_collectors, open_stream
+from datasets.mrt_cache import mrt_cache_settings, to_epoch
+from tools.routes.as_graph_aux import CsrAsGraph
+from tools.routes.path_table_aux import PathTable, PathTableBuilder
+from tools.routes.path_norm_aux import PATH_BREAK, edge_array, edge_keys, parse_path_tokens
 
 
 def sample_collectors(
@@ -61,13 +68,7 @@ def sample_collectors(
     ]
     for col in collectors:
         print(f"\n--- {col} ---")
-        stream = pybgpstream.BGPStream(
-            from_time=from_time,
-            until_time=until_time,
-            collectors=[col],
-            record_type="ribs",
-            data_interface="broker",
-        )
+        stream = open_stream(from_time, until_time, [col], "ribs")
         row_count = 0
         for rec in stream.records():
             for elem in rec:
@@ -81,169 +82,585 @@ def sample_collectors(
                 break
         print("Rows total:", row_count)
 
-def build_as_graph(
-    from_time: str,
-    until_time: str,
-    max_rows_per_collector: int | None = None,
-) -> nx.Graph:
+# Single-pass RIB scanning.
+# A sink consumes the (prefix, AS path) of every RIB entry. scan_ribs streams
+# each collector once and feeds every element to all the sinks, so building
+# several datasets costs a single pass over the dumps. Sinks are filled per
+# collector (in worker processes) on fresh copies made by `empty()` and then
+# folded into the caller's sinks with `merge()`.
+class RibSink:
+    def empty(self):
+        return type(self)()
 
-    collectors = [
-        # Route Views collectors
-        "route-views2", "route-views2.saopaulo", "route-views3", "route-views4",
-        "route-views5", "route-views6",
-        "route-views.amsix", "route-views.bdix", "route-views.bknix",
-        "route-views.chicago", "route-views.chile", "route-views.eqix",
-        "route-views.flix", "route-views.fortaleza", "route-views.gixa",
-        "route-views.gorex", "route-views.isc", "route-views.jinx",
-        "route-views.kixp", "route-views.linx", "route-views.mwix",
-        "route-views.napafrica", "route-views.nwax", "route-views.ny",
-        "route-views.perth", "route-views.peru", "route-views.phoix",
-        "route-views.rio", "route-views.saopaulo", "route-views.sfmix",
-        "route-views.sg", "route-views.siex", "route-views.soxrs",
-        "route-views.sydney", "route-views.telxatl", "route-views.uaeix",
-        "route-views.wide",
-        # RIPE RIS collectors (there is no rrc17)
-        "rrc00", "rrc01", "rrc02", "rrc03", "rrc04", "rrc05", "rrc06",
-        "rrc07", "rrc08", "rrc09", "rrc10", "rrc11", "rrc12", "rrc13",
-        "rrc14", "rrc15", "rrc16", "rrc18", "rrc19", "rrc20", "rrc21",
-        "rrc22", "rrc23", "rrc24", "rrc25", "rrc26"
-    ]
-    G = nx.Graph()
-    for col in collectors:
-        row_count = 0
-        stream = pybgpstream.BGPStream(
-            from_time=from_time,
-            until_time=until_time,
-            collectors=[col],
-            record_type="ribs",
-            data_interface="broker",
-        )
-        for rec in stream.records():
-            for elem in rec:
-                # Split and de-duplicate AS path (remove repeated prepends):contentReference[oaicite:1]{index=1}
-                as_path = [k for k, _ in groupby(elem.fields.get("as-path", "").split())]
-                if len(as_path) < 2:
-                    continue
-                # Add edges for consecutive ASNs
-                for a, b in zip(as_path, as_path[1:]):
-                    if a != b:
-                        G.add_edge(a, b)
-                row_count += 1
-                if max_rows_per_collector is not None and row_count >= max_rows_per_collector:
-                    break
-            if max_rows_per_collector is not None and row_count >= max_rows_per_collector:
-                break
-    return G
+    def consume(self, prefix: str, asns: list[str]):
+        raise NotImplementedError
 
-def group_routes_by_start_asn(
+    def finish(self):
+        """Called once a collector's scan is done (sinks that batch their input flush here)."""
+
+    def merge(self, other):
+        raise NotImplementedError
+
+class AsGraphEdgesSink(RibSink):
+    """
+    Undirected AS adjacencies; prepends, AS_SETs and private/reserved ASNs
+    removed. Paths are buffered as raw tokens and normalized in vectorized
+    batches of `batch_size` paths into packed uint64 edge keys.
+    """
+    batch_size = 100_000
+
+    def __init__(self):
+        self.keys = np.empty(0, dtype=np.uint64)
+        self._tokens: list[str] = []
+        self._pending = 0
+
+    def consume(self, prefix, asns):
+        self._tokens.extend(asns)
+        self._tokens.append(PATH_BREAK)
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.finish()
+
+    def finish(self):
+        if self._pending:
+            self.keys = np.union1d(self.keys, edge_keys(parse_path_tokens(self._tokens)))
+            self._tokens = []
+            self._pending = 0
+
+    def merge(self, other):
+        self.finish()
+        other.finish()
+        self.keys = np.union1d(self.keys, other.keys)
+
+    @property
+    def pairs(self) -> np.ndarray:
+        """(m, 2) uint32 array of the edges, each stored once with the lower ASN first."""
+        self.finish()
+        return edge_array(self.keys)
+
+    @property
+    def edges(self) -> set[tuple[str, str]]:
+        return {(str(a), str(b)) for a, b in self.pairs.tolist()}
+
+class RoutesByStartAsnSink(RibSink):
+    """Full AS paths (prepends included) grouped by their first ASN."""
+    def __init__(self):
+        self.routes_by_asn: dict[str, list[list[str]]] = {}
+
+    def consume(self, prefix, asns):
+        self.routes_by_asn.setdefault(asns[0], []).append(asns)
+
+    def merge(self, other):
+        merge_route_buckets(self.routes_by_asn, other.routes_by_asn)
+
+class RoutesByAsnSink(RoutesByStartAsnSink):
+    """Full AS paths appended to the bucket of every ASN they contain."""
+    def consume(self, prefix, asns):
+        for asn in asns:
+            self.routes_by_asn.setdefault(asn, []).append(asns)
+
+class PathTableSink(RibSink):
+    """Interned AS paths (see PathTableBuilder)."""
+    def __init__(self):
+        self.builder = PathTableBuilder()
+
+    def consume(self, prefix, asns):
+        self.builder.add(asns)
+
+    def merge(self, other):
+        self.builder.merge(other.builder)
+
+class PrefixOriginSink(RibSink):
+    """Prefix -> set of origin ASNs (the last ASN of each AS path)."""
+    def __init__(self):
+        self.prefix_origin: dict[str, set[str]] = defaultdict(set)
+
+    def consume(self, prefix, asns):
+        if prefix:
+            self.prefix_origin[prefix].add(asns[-1])
+
+    def merge(self, other):
+        for pfx, origins in other.prefix_origin.items():
+            self.prefix_origin[pfx] |= origins
+
+    def moas_prefixes(self) -> list[list]:
+        return [[pfx, origins] for pfx, origins in self.prefix_origin.items() if len(origins) > 1]
+
+def scan_collector(
+    collector: str,
     from_time: str,
     until_time: str,
     max_rows_per_collector: int | None = None,
-) -> dict[str, list[list[str]]]:
-
-    collectors = [
-        # Route Views collectors
-        "route-views2", "route-views2.saopaulo", "route-views3", "route-views4",
-        "route-views5", "route-views6",
-        "route-views.amsix", "route-views.bdix", "route-views.bknix",
-        "route-views.chicago", "route-views.chile", "route-views.eqix",
-        "route-views.flix", "route-views.fortaleza", "route-views.gixa",
-        "route-views.gorex", "route-views.isc", "route-views.jinx",
-        "route-views.kixp", "route-views.linx", "route-views.mwix",
-        "route-views.napafrica", "route-views.nwax", "route-views.ny",
-        "route-views.perth", "route-views.peru", "route-views.phoix",
-        "route-views.rio", "route-views.saopaulo", "route-views.sfmix",
-        "route-views.sg", "route-views.siex", "route-views.soxrs",
-        "route-views.sydney", "route-views.telxatl", "route-views.uaeix",
-        "route-views.wide",
-        # RIPE RIS collectors (there is no rrc17)
-        "rrc00", "rrc01", "rrc02", "rrc03", "rrc04", "rrc05", "rrc06",
-        "rrc07", "rrc08", "rrc09", "rrc10", "rrc11", "rrc12", "rrc13",
-        "rrc14", "rrc15", "rrc16", "rrc18", "rrc19", "rrc20", "rrc21",
-        "rrc22", "rrc23", "rrc24", "rrc25", "rrc26"
-    ]
-    routes_by_asn: dict[str, list[list[str]]] = {}
-    for col in collectors:
-        row_count = 0
-        stream = pybgpstream.BGPStream(
-            from_time=from_time,
-            until_time=until_time,
-            collectors=[col],
-            record_type="ribs",
-            data_interface="broker",
-        )
+    sinks: list[RibSink] = (),
+) -> list[RibSink]:
+    """Stream one collector's RIB once and feed every entry to fresh copies of the sinks."""
+    sinks = [sink.empty() for sink in sinks]
+    row_count = 0
+    stream = open_stream(from_time, until_time, [collector], "ribs")
+    try:
         for rec in stream.records():
             for elem in rec:
-                # Get the AS path string and split it into a list of ASNs:contentReference[oaicite:1]{index=1}
                 as_path_str = elem.fields.get("as-path", "")
                 if not as_path_str:
                     continue
                 asns = as_path_str.split()
                 if not asns:
                     continue
-                first_asn = asns[0]
-                # Append the entire path (including any prepends) to this ASN's list
-                routes_by_asn.setdefault(first_asn, []).append(asns)
+                prefix = elem.fields.get("prefix")
+                for sink in sinks:
+                    sink.consume(prefix, asns)
                 row_count += 1
                 if max_rows_per_collector is not None and row_count >= max_rows_per_collector:
-                    break
-            if max_rows_per_collector is not None and row_count >= max_rows_per_collector:
-                break
+                    return sinks
+        return sinks
+    finally:
+        for sink in sinks:
+            sink.finish()
+
+def map_collectors(
+    func,
+    from_time: str,
+    until_time: str,
+    max_rows_per_collector: int | None = None,
+    workers: int | None = None,
+    collectors: list[str] | None = None,
+    extra_args: tuple = (),
+    record_type: str = "ribs",
+):
+    """
+    Run func(collector, from_time, until_time, max_rows_per_collector, *extra_args)
+    for every collector and yield the per-collector partial results in collector order.
+    With more than one worker the collectors are fanned out over a process pool
+    (`workers=None` uses all the cores); `func` must be a module-level function.
+    `collectors=None` scans the collectors that have `record_type` dumps in the
+    window, according to the collector registry.
+    """
+    cache_dir, offline = mrt_cache_settings()
+    if collectors is None:
+        collectors = live_collectors(from_time, until_time, record_type)
+    elif cache_dir and not offline:
+        # Probe the broker once here, so the workers find the dumps to cache in the registry
+        get_collector_registry().dump_files(from_time, until_time, record_type, list(collectors))
+    workers = workers or os.cpu_count() or 1
+    args = [(col, from_time, until_time, max_rows_per_collector) + tuple(extra_args) for col in collectors]
+    if workers == 1 or len(args) <= 1:
+        for a in args:
+            yield func(*a)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(args))) as pool:
+        yield from pool.map(func, *zip(*args))
+
+# Checkpointing: every finished collector's partial sinks are pickled to
+# <checkpoint_dir>/<collector>.pkl (written atomically by the worker), and
+# manifest.json records the build parameters and the completed collectors.
+# A later run with the same parameters and directory merges the saved
+# partials and only streams the collectors that are still missing.
+CHECKPOINT_MANIFEST = "manifest.json"
+
+def _checkpoint_file(checkpoint_dir: str, collector: str) -> str:
+    return os.path.join(checkpoint_dir, f"{collector}.pkl")
+
+def _write_json_atomic(path: str, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def open_checkpoint_dir(checkpoint_dir: str, build: dict, resume: bool = True) -> dict:
+    """
+    Prepare a checkpoint directory for a build and return its manifest.
+    Refuses to resume checkpoints written by a build with other parameters.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    manifest_path = os.path.join(checkpoint_dir, CHECKPOINT_MANIFEST)
+    if resume and os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest["build"] != build:
+            raise ValueError(f"Checkpoints in {checkpoint_dir} belong to another build: {manifest['build']}")
+    else:
+        for name in os.listdir(checkpoint_dir):
+            if name.endswith(".pkl"):
+                os.remove(os.path.join(checkpoint_dir, name))
+        manifest = {"build": build, "completed": []}
+        _write_json_atomic(manifest_path, manifest)
+    # A worker may have finished a collector after the manifest was last written
+    for name in os.listdir(checkpoint_dir):
+        collector = name[:-len(".pkl")]
+        if name.endswith(".pkl") and collector not in manifest["completed"]:
+            manifest["completed"].append(collector)
+    return manifest
+
+def scan_collector_checkpointed(
+    collector: str,
+    from_time: str,
+    until_time: str,
+    max_rows_per_collector: int | None,
+    sinks: list[RibSink],
+    checkpoint_dir: str,
+) -> list[RibSink]:
+    sinks = scan_collector(collector, from_time, until_time, max_rows_per_collector, sinks)
+    path = _checkpoint_file(checkpoint_dir, collector)
+    with open(f"{path}.tmp", "wb") as f:
+        pickle.dump(sinks, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f"{path}.tmp", path)
+    return sinks
+
+def scan_ribs(
+    from_time: str,
+    until_time: str,
+    sinks: list[RibSink],
+    max_rows_per_collector: int | None = None,
+    workers: int | None = None,
+    collectors: list[str] | None = None,
+    checkpoint_dir: str | None = None,
+    resume: bool = True,
+) -> list[RibSink]:
+    """
+    One pass over every collector's RIB feeding all the given sinks, e.g.
+    `edges, by_asn, origins = scan_ribs(t0, t1, [AsGraphEdgesSink(), RoutesByAsnSink(), PrefixOriginSink()])`.
+    With `checkpoint_dir` each finished collector is saved to disk, and an
+    interrupted build rerun with the same arguments resumes where it stopped
+    (`resume=False` discards the existing checkpoints). By default every
+    collector the registry finds RIB dumps for is scanned.
+    """
+    if collectors is None:
+        collectors = live_collectors(from_time, until_time, "ribs")
+    empties = [sink.empty() for sink in sinks]
+    if checkpoint_dir is None:
+        for partials in map_collectors(scan_collector, from_time, until_time, max_rows_per_collector,
+                                       workers, collectors, extra_args=(empties,)):
+            for sink, partial in zip(sinks, partials):
+                sink.merge(partial)
+        return sinks
+
+    build = {
+        "from_time": from_time,
+        "until_time": until_time,
+        "max_rows_per_collector": max_rows_per_collector,
+        "sinks": [type(sink).__name__ for sink in sinks],
+    }
+    manifest = open_checkpoint_dir(checkpoint_dir, build, resume)
+    manifest_path = os.path.join(checkpoint_dir, CHECKPOINT_MANIFEST)
+    remaining = []
+    for col in collectors:
+        if col in manifest["completed"]:
+            with open(_checkpoint_file(checkpoint_dir, col), "rb") as f:
+                partials = pickle.load(f)
+            for sink, partial in zip(sinks, partials):
+                sink.merge(partial)
+        else:
+            remaining.append(col)
+    results = map_collectors(scan_collector_checkpointed, from_time, until_time, max_rows_per_collector,
+                             workers, remaining, extra_args=(empties, checkpoint_dir))
+    for col, partials in zip(remaining, results):
+        for sink, partial in zip(sinks, partials):
+            sink.merge(partial)
+        manifest["completed"].append(col)
+        _write_json_atomic(manifest_path, manifest)
+    return sinks
+
+def merge_route_buckets(routes_by_asn: dict[str, list[list[str]]], partial: dict[str, list[list[str]]]):
+    for asn, routes in partial.items():
+        routes_by_asn.setdefault(asn, []).extend(routes)
     return routes_by_asn
 
+def build_as_graph(
+    from_time: str,
+    until_time: str,
+    max_rows_per_collector: int | None = None,
+    workers: int | None = None,
+    checkpoint_dir: str | None = None,
+) -> nx.Graph:
+    sink, = scan_ribs(from_time, until_time, [AsGraphEdgesSink()], max_rows_per_collector, workers,
+                      checkpoint_dir=checkpoint_dir)
+    G = nx.Graph()
+    G.add_edges_from(sink.edges)
+    return G
+
+def as_graph_csr_from_edges(edges: set[tuple[str, str]]) -> CsrAsGraph:
+    # Skip AS_SET tokens such as "{1,2}"
+    return CsrAsGraph.from_edges((a, b) for a, b in edges if a.isdigit() and b.isdigit())
+
+def build_as_graph_csr(
+    from_time: str,
+    until_time: str,
+    max_rows_per_collector: int | None = None,
+    workers: int | None = None,
+    checkpoint_dir: str | None = None,
+) -> CsrAsGraph:
+    """
+    Same as build_as_graph, but returns the compact CSR graph. Save it with
+    `.save_mmap("datasets/routes/as_graph.asg")` so that routes tool workers can
+    memory-map it (or `.save(...npz)` for a portable copy).
+    """
+    sink, = scan_ribs(from_time, until_time, [AsGraphEdgesSink()], max_rows_per_collector, workers,
+                      checkpoint_dir=checkpoint_dir)
+    return CsrAsGraph.from_edge_array(sink.pairs)
+
+def group_routes_by_start_asn(
+    from_time: str,
+    until_time: str,
+    max_rows_per_collector: int | None = None,
+    workers: int | None = None,
+    checkpoint_dir: str | None = None,
+) -> dict[str, list[list[str]]]:
+    sink, = scan_ribs(from_time, until_time, [RoutesByStartAsnSink()], max_rows_per_collector, workers,
+                      checkpoint_dir=checkpoint_dir)
+    return sink.routes_by_asn
+
 def group_routes_by_asn(
     from_time: str,
     until_time: str,
     max_rows_per_collector: int | None = None,
+    workers: int | None = None,
+    checkpoint_dir: str | None = None,
 ) -> dict[str, list[list[str]]]:
-    collectors = [
-        # Route Views collectors
-        "route-views2", "route-views2.saopaulo", "route-views3", "route-views4",
-        "route-views5", "route-views6",
-        "route-views.amsix", "route-views.bdix", "route-views.bknix",
-        "route-views.chicago", "route-views.chile", "route-views.eqix",
-        "route-views.flix", "route-views.fortaleza", "route-views.gixa",
-        "route-views.gorex", "route-views.isc", "route-views.jinx",
-        "route-views.kixp", "route-views.linx", "route-views.mwix",
-        "route-views.napafrica", "route-views.nwax", "route-views.ny",
-        "route-views.perth", "route-views.peru", "route-views.phoix",
-        "route-views.rio", "route-views.saopaulo", "route-views.sfmix",
-        "route-views.sg", "route-views.siex", "route-views.soxrs",
-        "route-views.sydney", "route-views.telxatl", "route-views.uaeix",
-        "route-views.wide",
-        # RIPE RIS collectors (there is no rrc17)
-        "rrc00", "rrc01", "rrc02", "rrc03", "rrc04", "rrc05", "rrc06",
-        "rrc07", "rrc08", "rrc09", "rrc10", "rrc11", "rrc12", "rrc13",
-        "rrc14", "rrc15", "rrc16", "rrc18", "rrc19", "rrc20", "rrc21",
-        "rrc22", "rrc23", "rrc24", "rrc25", "rrc26"
-    ]
-    routes_by_asn: dict[str, list[list[str]]] = {}
-    for col in collectors:
-        row_count = 0
-        stream = pybgpstream.BGPStream(
-            from_time=from_time,
-            until_time=until_time,
-            collectors=[col],
-            record_type="ribs",
-            data_interface="broker",
-        )
+    sink, = scan_ribs(from_time, until_time, [RoutesByAsnSink()], max_rows_per_collector, workers,
+                      checkpoint_dir=checkpoint_dir)
+    return sink.routes_by_asn
+
+def build_path_table(
+    from_time: str,
+    until_time: str,
+    max_rows_per_collector: int | None = None,
+    workers: int | None = None,
+    checkpoint_dir: str | None = None,
+) -> PathTable:
+    """
+    Interned alternative to group_routes_by_asn: every distinct AS path is
+    stored once as a uint32 array with per-ASN posting lists of path ids.
+    Save it with `.save()` (tools/routes/routes_table.npz) for the routes tools.
+    Paths that contain AS_SETs are skipped.
+    """
+    sink, = scan_ribs(from_time, until_time, [PathTableSink()], max_rows_per_collector, workers,
+                      checkpoint_dir=checkpoint_dir)
+    return sink.builder.build()
+
+def build_rib_datasets(
+    from_time: str,
+    until_time: str,
+    max_rows_per_collector: int | None = None,
+    workers: int | None = None,
+    checkpoint_dir: str | None = None,
+) -> dict:
+    """
+    Build the AS graph, both route groupings and the prefix -> origins table
+    from a single pass over the RIBs, instead of one pass per builder.
+    """
+    edges, by_start_asn, by_asn, origins = scan_ribs(
+        from_time, until_time,
+        [AsGraphEdgesSink(), RoutesByStartAsnSink(), RoutesByAsnSink(), PrefixOriginSink()],
+        max_rows_per_collector, workers, checkpoint_dir=checkpoint_dir,
+    )
+    G = nx.Graph()
+    G.add_edges_from(edges.edges)
+    return {
+        "as_graph": G,
+        "routes_by_start_asn": by_start_asn.routes_by_asn,
+        "routes_by_asn": by_asn.routes_by_asn,
+        "prefix_origin": dict(origins.prefix_origin),
+        "moas_prefixes": origins.moas_prefixes(),
+    }
+
+
+# Incremental AS graph maintenance from BGP update streams
+class IncrementalAsGraph:
+    """
+    AS graph kept fresh from `record_type="updates"` streams instead of full
+    RIB rebuilds. Every edge carries the timestamp it was last seen on.
+    Each (collector, peer ASN, peer address, prefix) route points to the
+    interned edge set of its current AS path: an announcement replaces the
+    route, a withdrawal drops it. Edges count the live paths using them, so
+    the state grows with the distinct paths, not with every route's copy.
+    Stable edges that see no churn are re-stamped by `refresh_from_rib()`
+    from a RIB snapshot. Edges that no live route supports and that were not
+    seen for `max_age` seconds are removed by `expire()`.
+    """
+    def __init__(self, max_age: float = 7 * 24 * 3600):
+        self.max_age = max_age
+        self.last_seen: dict[tuple[str, str], float] = {}
+        self.refcount: dict[tuple[str, str], int] = defaultdict(int)
+        self.sessions: dict[tuple[str, str, str], int] = {}
+        self.routes: dict[tuple[int, str], int] = {}
+        self.paths: dict[int, tuple] = {}
+        self.path_ids: dict[tuple, int] = {}
+        self.path_refs: dict[int, int] = {}
+        self._next_path_id = 0
+        self.last_update: float = 0.0
+        self.last_rib: float = 0.0
+
+    @classmethod
+    def from_graph(cls, G: nx.Graph, timestamp: float, max_age: float = 7 * 24 * 3600) -> "IncrementalAsGraph":
+        """Start from a full snapshot (e.g. build_as_graph output) taken at `timestamp`."""
+        inc = cls(max_age)
+        inc._stamp(G.edges(), timestamp)
+        inc.last_update = inc.last_rib = timestamp
+        return inc
+
+    @classmethod
+    def load(cls, path: str) -> "IncrementalAsGraph":
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def save(self, path: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def _stamp(self, edges, timestamp: float):
+        for a, b in edges:
+            a, b = str(a), str(b)
+            edge = (a, b) if a < b else (b, a)
+            self.last_seen[edge] = max(timestamp, self.last_seen.get(edge, 0.0))
+
+    def refresh_from_rib(
+        self,
+        from_time: str,
+        until_time: str,
+        collectors: list[str] | None = None,
+        workers: int | None = None,
+    ) -> int:
+        """Mark every edge of a RIB snapshot as seen at its end; returns the number of edges."""
+        edges, = scan_ribs(from_time, until_time, [AsGraphEdgesSink()], workers=workers, collectors=collectors)
+        timestamp = float(to_epoch(until_time))
+        self._stamp(edges.pairs.tolist(), timestamp)
+        self.last_rib = max(self.last_rib, timestamp)
+        return len(edges.keys)
+
+    @staticmethod
+    def _path_edges(asns: list[str]) -> tuple:
+        # Normalized like AsGraphEdgesSink (prepends, AS_SETs and private /
+        # reserved ASNs removed), so updates add the edges a rebuild would
+        pairs = edge_array(edge_keys(parse_path_tokens(asns))).tolist()
+        return tuple(sorted((a, b) if a < b else (b, a) for a, b in ((str(a), str(b)) for a, b in pairs)))
+
+    def _route_key(self, collector: str, peer: str, peer_address: str, prefix: str) -> tuple[int, str]:
+        session = (collector, peer, peer_address)
+        if session not in self.sessions:
+            self.sessions[session] = len(self.sessions)
+        return self.sessions[session], prefix
+
+    def _acquire_path(self, edges: tuple) -> int:
+        path_id = self.path_ids.get(edges)
+        if path_id is None:
+            path_id = self._next_path_id
+            self._next_path_id += 1
+            self.path_ids[edges] = path_id
+            self.paths[path_id] = edges
+            self.path_refs[path_id] = 0
+            for edge in edges:
+                self.refcount[edge] += 1
+        self.path_refs[path_id] += 1
+        return path_id
+
+    def _release(self, key):
+        path_id = self.routes.pop(key, None)
+        if path_id is None:
+            return
+        self.path_refs[path_id] -= 1
+        if self.path_refs[path_id] > 0:
+            return
+        del self.path_refs[path_id]
+        edges = self.paths.pop(path_id)
+        del self.path_ids[edges]
+        for edge in edges:
+            self.refcount[edge] -= 1
+            if self.refcount[edge] <= 0:
+                del self.refcount[edge]
+
+    def announce(self, collector: str, peer: str, prefix: str, asns: list[str], timestamp: float,
+                 peer_address: str = ""):
+        key = self._route_key(collector, peer, peer_address, prefix)
+        edges = self._path_edges(asns)
+        # Take the new path before dropping the old one, so an unchanged path is kept
+        path_id = self._acquire_path(edges)
+        self._release(key)
+        self.routes[key] = path_id
+        self._stamp(edges, timestamp)
+        self.last_update = max(self.last_update, timestamp)
+
+    def withdraw(self, collector: str, peer: str, prefix: str, timestamp: float, peer_address: str = ""):
+        self._release(self._route_key(collector, peer, peer_address, prefix))
+        self.last_update = max(self.last_update, timestamp)
+
+    def apply_updates(
+        self,
+        from_time: str,
+        until_time: str,
+        collectors: list[str] | None = None,
+    ) -> int:
+        """Apply the announcements and withdrawals of a time window; returns the number of elements applied."""
+        if collectors is None:
+            collectors = live_collectors(from_time, until_time, "updates")
+        stream = open_stream(from_time, until_time, collectors, "updates")
+        applied = 0
         for rec in stream.records():
             for elem in rec:
-                as_path_str = elem.fields.get("as-path", "")
-                if not as_path_str:
+                prefix = elem.fields.get("prefix")
+                if not prefix:
                     continue
-                asns = as_path_str.split()
-                if not asns:
+                peer_address = str(getattr(elem, "peer_address", ""))
+                if elem.type in ("A", "R"):
+                    asns = elem.fields.get("as-path", "").split()
+                    if not asns:
+                        continue
+                    self.announce(rec.collector, str(elem.peer_asn), prefix, asns, elem.time, peer_address)
+                elif elem.type == "W":
+                    self.withdraw(rec.collector, str(elem.peer_asn), prefix, elem.time, peer_address)
+                else:
                     continue
-                # For each ASN in the path, append the full path to that ASN's list
-                for asn in asns:
-                    routes_by_asn.setdefault(asn, []).append(asns)
-                row_count += 1
-                if max_rows_per_collector is not None and row_count >= max_rows_per_collector:
-                    break
-            if max_rows_per_collector is not None and row_count >= max_rows_per_collector:
-                break
-    return routes_by_asn
+                applied += 1
+        return applied
+
+    def expire(self, now: float | None = None) -> int:
+        """Drop unsupported edges not seen for max_age seconds; returns how many were removed."""
+        cutoff = (self.last_update if now is None else now) - self.max_age
+        stale = [edge for edge, seen in self.last_seen.items() if seen < cutoff and edge not in self.refcount]
+        for edge in stale:
+            del self.last_seen[edge]
+        return len(stale)
+
+    def to_networkx(self) -> nx.Graph:
+        G = nx.Graph()
+        G.add_edges_from(self.last_seen)
+        return G
+
+    def to_csr(self) -> CsrAsGraph:
+        return as_graph_csr_from_edges(self.last_seen)
+
+def update_as_graph(
+    state_path: str,
+    from_time: str,
+    until_time: str,
+    graph_path: str = "datasets/routes/as_graph.asg",
+    collectors: list[str] | None = None,
+    rib_every: float | None = 24 * 3600,
+    rib_window: float = 8 * 3600,
+) -> IncrementalAsGraph:
+    """
+    One incremental refresh (e.g. run every 15 minutes): load the saved
+    IncrementalAsGraph state, apply the updates of [from_time, until_time),
+    age out stale edges, then persist both the state and the graph the
+    routes tools read. Every `rib_every` seconds the edges are re-stamped
+    from the RIBs dumped in the `rib_window` seconds up to `until_time`
+    (keep `rib_every` well below the state's max_age). Seed the state once with
+    `IncrementalAsGraph.from_graph(build_as_graph(...), timestamp).save(state_path)`.
+    """
+    inc = IncrementalAsGraph.load(state_path)
+    inc.apply_updates(from_time, until_time, collectors)
+    until = to_epoch(until_time)
+    if rib_every is not None and until - inc.last_rib >= rib_every:
+        inc.refresh_from_rib(until - int(rib_window), until, collectors)
+    inc.expire()
+    inc.save(state_path)
+    if graph_path.endswith(".asg"):
+        inc.to_csr().save_mmap(graph_path)
+    else:
+        with open(graph_path, "wb") as f:
+            pickle.dump(inc.to_networkx(), f)
+    return inc
 
 
 # caida_dataset_path = 'datasets/caida/caida_dataset.json'
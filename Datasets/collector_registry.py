@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import threading
+from dataclasses import asdict
+import requests
+import pybgpstream
+from datasets.mrt_cache import DumpFile, LocalDumpStream, cached_dumps, fetch_dumps, mrt_cache_settings, to_epoch
+
+# Collector registry shared by the BGPStream dataset builders.
+# Knows the Route Views / RIPE RIS collectors, asks the BGPStream broker once
+# per (record type, time window) which of them actually published dumps, and
+# caches the answer on disk, so builders skip dead collectors without
+# opening a stream per collector. The probed dump files are the work units:
+# they weigh the live collectors, which are handed out heaviest first so a
+# process pool starts the long scans early.
+
+BROKER_URL = "https://broker.bgpstream.caida.org/v2/data"
+REGISTRY_CACHE_PATH = "datasets/collectors_cache.json"
+DATA_INTERFACE = "broker"
+# Collectors publish a dump some time after it ends, so answers for windows
+# ending less than PUBLICATION_DELAY before the probe may still grow: those
+# are re-probed once they are RECENT_PROBE_TTL seconds old
+PUBLICATION_DELAY = 2 * 3600
+RECENT_PROBE_TTL = 5 * 60
+
+# Route Views and RIPE RIS collectors used by the dataset builders
+COLLECTORS = [
+    # Route Views collectors
+    "route-views2", "route-views2.saopaulo", "route-views3", "route-views4",
+    "route-views5", "route-views6",
+    "route-views.amsix", "route-views.bdix", "route-views.bknix",
+    "route-views.chicago", "route-views.chile", "route-views.eqix",
+    "route-views.flix", "route-views.fortaleza", "route-views.gixa",
+    "route-views.gorex", "route-views.isc", "route-views.jinx",
+    "route-views.kixp", "route-views.linx", "route-views.mwix",
+    "route-views.napafrica", "route-views.nwax", "route-views.ny",
+    "route-views.perth", "route-views.peru", "route-views.phoix",
+    "route-views.rio", "route-views.saopaulo", "route-views.sfmix",
+    "route-views.sg", "route-views.siex", "route-views.soxrs",
+    "route-views.sydney", "route-views.telxatl", "route-views.uaeix",
+    "route-views.wide",
+    # RIPE RIS collectors (there is no rrc17)
+    "rrc00", "rrc01", "rrc02", "rrc03", "rrc04", "rrc05", "rrc06",
+    "rrc07", "rrc08", "rrc09", "rrc10", "rrc11", "rrc12", "rrc13",
+    "rrc14", "rrc15", "rrc16", "rrc18", "rrc19", "rrc20", "rrc21",
+    "rrc22", "rrc23", "rrc24", "rrc25", "rrc26"
+]
+
+def open_stream(from_time, until_time, collectors, record_type="ribs", filter=None):
+    """
+    The BGPStream every builder reads from (one place to change the data
+    interface). With the MRT cache switched on (mrt_cache.use_mrt_cache) the
+    dumps are read from local files instead: missing ones are downloaded
+    first, or, offline, only the cached ones are read.
+    """
+    cache_dir, offline = mrt_cache_settings()
+    if cache_dir and not offline:
+        # Download the window's dumps; if the broker cannot be probed, stream
+        # from it directly rather than read a possibly empty cache
+        units = get_collector_registry().plan(from_time, until_time, record_type, list(collectors))
+        if units is None:
+            cache_dir = None
+        else:
+            fetch_dumps(units, cache_dir)
+    if cache_dir:
+        units = [unit for col in collectors
+                 for unit in cached_dumps(col, from_time, until_time, record_type, cache_dir)]
+        units.sort(key=lambda unit: (unit.initial_time, unit.collector))
+        return LocalDumpStream(units, from_time, until_time, record_type, filter)
+    return pybgpstream.BGPStream(
+        from_time=from_time,
+        until_time=until_time,
+        collectors=list(collectors),
+        record_type=record_type,
+        filter=filter,
+        data_interface=DATA_INTERFACE,
+    )
+
+class CollectorRegistry:
+    def __init__(self, cache_path: str | None = REGISTRY_CACHE_PATH, broker_url: str = BROKER_URL,
+                 timeout: float = 30, batch: int = 20, publication_delay: float = PUBLICATION_DELAY,
+                 recent_ttl: float = RECENT_PROBE_TTL):
+        self.cache_path = cache_path
+        self.broker_url = broker_url
+        self.timeout = timeout
+        self.batch = batch
+        self.publication_delay = publication_delay
+        self.recent_ttl = recent_ttl
+        self._lock = threading.Lock()
+        self._windows: dict[str, dict[str, list[dict]]] = {}
+        # When each (window, collector) answer was probed
+        self._probed: dict[str, dict[str, float]] = {}
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            # Caches written without probe times cannot tell final answers apart
+            if "windows" in cached:
+                self._windows, self._probed = cached["windows"], cached["probed"]
+
+    @staticmethod
+    def _window_key(from_time, until_time, record_type: str) -> str:
+        return f"{record_type} {to_epoch(from_time)} {to_epoch(until_time)}"
+
+    def _is_current(self, probed: float | None, end: int, now: float) -> bool:
+        # Answers probed after the window's dumps were all published are final
+        if probed is None:
+            return False
+        return probed >= end + self.publication_delay or now - probed < self.recent_ttl
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        # Worker processes may probe (and save) concurrently
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"windows": self._windows, "probed": self._probed}, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def _query_broker(self, start: int, end: int, record_type: str, collectors: list[str]) -> dict[str, list[dict]]:
+        found = {col: [] for col in collectors}
+        seen = set()
+        params = {"intervals[]": f"{start},{end}", "collectors[]": collectors, "types[]": record_type}
+        while True:
+            response = requests.get(self.broker_url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json().get("data") or {}
+            files = data.get("resources") or data.get("dumpFiles") or []
+            new = [f for f in files if f.get("url") not in seen]
+            if not new:
+                return found
+            for f in new:
+                seen.add(f["url"])
+                if f.get("collector") in found:
+                    found[f["collector"]].append(asdict(DumpFile(
+                        f["collector"], f.get("type", record_type), f["url"],
+                        int(f.get("initialTime", 0)), int(f.get("duration", 0)))))
+            # Page through large answers by dump time
+            params["minInitialTime"] = max(int(f.get("initialTime", 0)) for f in new) + 1
+
+    def dump_files(self, from_time, until_time, record_type: str = "ribs",
+                   collectors: list[str] = COLLECTORS) -> dict[str, list[DumpFile]] | None:
+        """
+        Dump files of every collector in the window, probing the broker only
+        for collectors not yet cached (or cached before the window's dumps
+        could all be published). Returns None when the broker cannot be
+        reached (callers then treat every collector as live).
+        """
+        with self._lock:
+            try:
+                key = self._window_key(from_time, until_time, record_type)
+                start, end = to_epoch(from_time), to_epoch(until_time)
+                now = time.time()
+                window = self._windows.setdefault(key, {})
+                probed = self._probed.setdefault(key, {})
+                missing = [col for col in collectors
+                           if col not in window or not self._is_current(probed.get(col), end, now)]
+                if missing:
+                    for i in range(0, len(missing), self.batch):
+                        batch = missing[i:i + self.batch]
+                        window.update(self._query_broker(start, end, record_type, batch))
+                        probed.update(dict.fromkeys(batch, now))
+                    self._save()
+            except (requests.RequestException, ValueError, KeyError) as e:
+                print(f"Collector probe failed ({e}); assuming all collectors are live")
+                return None
+            return {col: [DumpFile(**f) for f in window[col]] for col in collectors}
+
+    def live_collectors(self, from_time, until_time, record_type: str = "ribs",
+                        collectors: list[str] = COLLECTORS) -> list[str]:
+        """Collectors with data in the window, heaviest first (so a process pool starts the long scans early)."""
+        cache_dir, offline = mrt_cache_settings()
+        if offline:
+            files = {col: cached_dumps(col, from_time, until_time, record_type, cache_dir) for col in collectors}
+        else:
+            files = self.dump_files(from_time, until_time, record_type, collectors)
+        if files is None:
+            return list(collectors)
+        live = [col for col in collectors if files[col]]
+        return sorted(live, key=lambda col: -sum(_weight(f) for f in files[col]))
+
+    def plan(self, from_time, until_time, record_type: str = "ribs",
+             collectors: list[str] = COLLECTORS) -> list[DumpFile] | None:
+        """All (collector, dump file) work units of the window in time order (None if the broker cannot be probed)."""
+        files = self.dump_files(from_time, until_time, record_type, collectors)
+        if files is None:
+            return None
+        return sorted((f for fs in files.values() for f in fs), key=lambda f: (f.initial_time, f.collector))
+
+def _weight(unit: DumpFile) -> float:
+    # RIB dumps are full tables; update dumps grow with the time they cover
+    return 1.0 if unit.record_type == "ribs" else max(unit.duration, 1) / 900
+
+_REGISTRY = None
+
+def get_collector_registry() -> CollectorRegistry:
+    """Return the shared registry, loading its on-disk cache on first use."""
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = CollectorRegistry()
+    return _REGISTRY
+
+def live_collectors(from_time, until_time, record_type: str = "ribs",
+                    collectors: list[str] = COLLECTORS) -> list[str]:
+    return get_collector_registry().live_collectors(from_time, until_time, record_type, collectors)
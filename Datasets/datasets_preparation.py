@@ -5,7 +5,7 @@ import requests
 import ipaddress
 from neo4j import GraphDatabase, RoutingControl 
 import neo4j
-from typing import List, Dict, Set, Any, Tuple, Iterable
+from typing import List, Dict, Set, Any, Tuple, Iterable, Union
 from collections import defaultdict
 from datetime import datetime, timedelta
 import urllib.request
@@ -18,6 +18,7 @@ from tqdm.auto import tqdm
 from datetime import datetime
 from tools.caida.caida_tools import *
 from tools.peeringdb.peeringdb_aux import *
+from tools.bogons.bogons_aux import BogonMatcher, NonBogonSampler, get_bogon_matcher, load_fullbogons
 
 
 caida_dataset_path = 'datasets/caida/caida_dataset.json'
@@ -96,88 +97,41 @@ def prepare_caida_datasets(dataset_size):
     create_qas_datasets_caida(asn_data)
 
 # Bogons
-def fetch_and_validate_ipv4_bogons(url: str) -> List[str]:
-    response = requests.get(url)
-    response.raise_for_status()
-
-    lines = response.text.strip().splitlines()
-    valid_prefixes = []
-
-    for line in lines:
-        line = line.strip()
-        if not line or line.startswith("#"):
-            continue
-        try:
-            ipaddress.IPv4Network(line, strict=False)
-            valid_prefixes.append(line)
-        except ValueError:
-            print(f"[!] Invalid IPv4 prefix skipped: {line}")
-
-    return valid_prefixes
-
-def fetch_and_validate_ipv6_bogons(url: str) -> List[str]:
-    response = requests.get(url)
-    response.raise_for_status()
-
-    lines = response.text.strip().splitlines()
-    valid_prefixes = []
-
-    for line in lines:
-        line = line.strip()
-        if not line or line.startswith("#"):
-            continue
-        try:
-            ipaddress.IPv6Network(line, strict=False)
-            valid_prefixes.append(line)
-        except ValueError:
-            print(f"[!] Invalid IPv6 prefix skipped: {line}")
-
-    return valid_prefixes
-
-def generate_random_non_bogon_ipv4_prefix(bogon_prefixes: Set[ipaddress.IPv4Network]) -> str:
-    while True:
-        # Choose a random prefix length (between /8 and /30 for reasonable subnets)
-        prefix_length = random.randint(8, 30)
-
-        # Generate a random base IP address aligned to the prefix
-        max_prefix_value = 2**(32 - prefix_length)
-        base_ip_int = random.randint(0, (2**32 - 1) // max_prefix_value) * max_prefix_value
-        network = ipaddress.IPv4Network((base_ip_int, prefix_length))
-
-        # Check if the prefix overlaps with any bogon
-        if any(network.subnet_of(bogon) or bogon.subnet_of(network) for bogon in bogon_prefixes):
-            continue  # Try again
-
-        return str(network)
-
-def generate_random_non_bogon_ipv6_prefix(bogon_prefixes: Set[ipaddress.IPv6Network]) -> str:
-    while True:
-        # Choose a random prefix length (e.g. /32 to /64 are common for global routing)
-        prefix_length = random.randint(32, 64)
-
-        # Generate a base address aligned with the prefix length
-        num_host_bits = 128 - prefix_length
-        base_int = (random.getrandbits(prefix_length) << num_host_bits)
-        network = ipaddress.IPv6Network((base_int, prefix_length))
-
-        # Ensure no overlap with any bogon
-        if any(network.subnet_of(bogon) or bogon.subnet_of(network) for bogon in bogon_prefixes):
-            continue
-
-        return str(network)
+# Labels come from the bogon engine of the runtime is_prefix_a_bogon tool
+# (tools/bogons/bogons_aux.py): bogon samples are drawn from its full bogon
+# snapshots and non-bogons are checked against its shared matcher.
+def _bogon_samples(version: int) -> list:
+    bogons = sorted(set(ipaddress.ip_network(p) for p in load_fullbogons(version)))
+    if not bogons:
+        raise RuntimeError(f"No IPv{version} full bogon list (the download failed)")
+    return bogons
+
+def _non_bogon_sampler(bogon_prefixes, version: int, min_length: int, max_length: int) -> NonBogonSampler:
+    if isinstance(bogon_prefixes, NonBogonSampler):
+        return bogon_prefixes
+    matcher = bogon_prefixes if isinstance(bogon_prefixes, BogonMatcher) else BogonMatcher(bogon_prefixes)
+    return NonBogonSampler(matcher, version, min_length, max_length)
+
+def generate_random_non_bogon_ipv4_prefix(bogon_prefixes: Union[NonBogonSampler, BogonMatcher, Set[ipaddress.IPv4Network]]) -> str:
+    # Random prefix between /8 and /30 drawn directly from the non-bogon space.
+    # Build the sampler once and pass it in when generating many prefixes.
+    return _non_bogon_sampler(bogon_prefixes, 4, 8, 30).sample()
+
+def generate_random_non_bogon_ipv6_prefix(bogon_prefixes: Union[NonBogonSampler, BogonMatcher, Set[ipaddress.IPv6Network]]) -> str:
+    # /32 to /64 are common for global routing
+    return _non_bogon_sampler(bogon_prefixes, 6, 32, 64).sample()
 
 def create_ipv4_bogons_dataset(num_of_address_samples):
-    ipv4_url = "https://www.team-cymru.org/Services/Bogons/fullbogons-ipv4.txt"
-    ipv4_bogons = fetch_and_validate_ipv4_bogons(ipv4_url)
-    bogon_prefixes_set_ipv4 = set(ipaddress.IPv4Network(p) for p in ipv4_bogons)
-    # clean_ipv4 = generate_random_non_bogon_ipv4_prefix(bogon_prefixes_set_ipv4)
+    bogon_prefixes_ipv4 = _bogon_samples(4)
+    sampler = _non_bogon_sampler(get_bogon_matcher(), 4, 8, 30)
+    # clean_ipv4 = generate_random_non_bogon_ipv4_prefix(sampler)
     # print(f"Random non-bogon IP: {clean_ipv4}")
     bogons_dataset = dict()
 
     for i in range(num_of_address_samples):
-        non_bogon_ipv4 = generate_random_non_bogon_ipv4_prefix(bogon_prefixes_set_ipv4)
+        non_bogon_ipv4 = generate_random_non_bogon_ipv4_prefix(sampler)
         bogons_dataset[str(non_bogon_ipv4)] = 'Non-Bogon'
-        bogon_ipv4 = random.choice(list(bogon_prefixes_set_ipv4))
+        bogon_ipv4 = random.choice(bogon_prefixes_ipv4)
         bogons_dataset[str(bogon_ipv4)] = 'Bogon'
     
     bogons_dataset_items = list(bogons_dataset.items())
@@ -186,17 +140,16 @@ def create_ipv4_bogons_dataset(num_of_address_samples):
     return bogons_dataset
 
 def create_ipv6_bogons_dataset(num_of_address_samples):
-    ipv6_url = "https://www.team-cymru.org/Services/Bogons/fullbogons-ipv6.txt"
-    ipv6_bogons = fetch_and_validate_ipv6_bogons(ipv6_url)
-    bogon_prefixes_set_ipv6 = set(ipaddress.IPv6Network(p) for p in ipv6_bogons)
-    # clean_ipv6 = generate_random_non_bogon_ipv6_prefix(bogon_prefixes_set_ipv6)
+    bogon_prefixes_ipv6 = _bogon_samples(6)
+    sampler = _non_bogon_sampler(get_bogon_matcher(), 6, 32, 64)
+    # clean_ipv6 = generate_random_non_bogon_ipv6_prefix(sampler)
     # print(f"Random non-bogon IPv6: {clean_ipv6}")
     bogons_dataset = dict()
 
     for i in range(num_of_address_samples):
-        non_bogon_ipv6 = generate_random_non_bogon_ipv6_prefix(bogon_prefixes_set_ipv6)
+        non_bogon_ipv6 = generate_random_non_bogon_ipv6_prefix(sampler)
         bogons_dataset[str(non_bogon_ipv6)] = 'Non-Bogon'
-        bogon_ipv6 = random.choice(list(bogon_prefixes_set_ipv6))
+        bogon_ipv6 = random.choice(bogon_prefixes_ipv6)
         bogons_dataset[str(bogon_ipv6)] = 'Bogon'
 
     bogons_dataset_items = list(bogons_dataset.items())
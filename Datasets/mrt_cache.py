@@ -0,0 +1,149 @@
+import os
+import re
+from calendar import timegm
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+import requests
+import pybgpstream
+
+# Local MRT dump cache.
+# Dumps are stored as <cache_dir>/<collector>/<record_type>/<initial_time>_<duration>_<file name>,
+# so the files of a (collector, time window) can be found from the file names
+# alone, without asking the broker. Cached files are read with BGPStream's
+# singlefile interface. The cache is switched on for the current process and
+# every worker it spawns with use_mrt_cache() (it is carried in environment
+# variables, so process pools inherit it).
+MRT_CACHE_DIR = "datasets/mrt_cache"
+MRT_CACHE_ENV = "BGP_MRT_CACHE_DIR"
+MRT_OFFLINE_ENV = "BGP_MRT_OFFLINE"
+
+_CACHED_NAME = re.compile(r"^(\d+)_(\d+)_(.+)$")
+
+_TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d")
+
+def to_epoch(t) -> int:
+    """
+    Epoch seconds of a time as BGPStream takes it: epoch int, datetime (naive
+    means UTC) or UTC "YYYY-MM-DD HH:MM:SS" string, optionally ending in "UTC".
+    """
+    if isinstance(t, datetime):
+        return timegm(t.utctimetuple())
+    if isinstance(t, (int, float)):
+        return int(t)
+    text = str(t).strip()
+    if text.upper().endswith("UTC"):
+        text = text[:-3].strip()
+    if text.isdigit():
+        return int(text)
+    for fmt in _TIME_FORMATS:
+        try:
+            return timegm(datetime.strptime(text, fmt).timetuple())
+        except ValueError:
+            pass
+    raise ValueError(f"Unrecognized time: {t!r}")
+
+@dataclass(frozen=True)
+class DumpFile:
+    """One MRT dump published by a collector: the unit of ingestion work."""
+    collector: str
+    record_type: str
+    url: str
+    initial_time: int
+    duration: int = 0
+
+def use_mrt_cache(cache_dir: str | None = MRT_CACHE_DIR, offline: bool = False):
+    """
+    Read dumps through the local cache (downloading missing ones), or only
+    from it with `offline=True`. `cache_dir=None` goes back to streaming from the broker.
+    """
+    if cache_dir is None:
+        os.environ.pop(MRT_CACHE_ENV, None)
+        os.environ.pop(MRT_OFFLINE_ENV, None)
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    os.environ[MRT_CACHE_ENV] = cache_dir
+    os.environ[MRT_OFFLINE_ENV] = "1" if offline else "0"
+
+def mrt_cache_settings() -> tuple[str | None, bool]:
+    """(cache directory or None, offline) of the current process."""
+    return os.environ.get(MRT_CACHE_ENV) or None, os.environ.get(MRT_OFFLINE_ENV) == "1"
+
+def cached_path(unit: DumpFile, cache_dir: str = MRT_CACHE_DIR) -> str:
+    name = unit.url.rstrip("/").rsplit("/", 1)[-1]
+    return os.path.join(cache_dir, unit.collector, unit.record_type, f"{unit.initial_time}_{unit.duration}_{name}")
+
+def fetch_dump(unit: DumpFile, cache_dir: str = MRT_CACHE_DIR, timeout: float = 60) -> str:
+    """Download a dump into the cache unless it is already there; returns the local path."""
+    path = cached_path(unit, cache_dir)
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.part"
+    with requests.get(unit.url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        with open(tmp_path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=1 << 20):
+                f.write(chunk)
+    os.replace(tmp_path, path)
+    return path
+
+def fetch_dumps(units: list[DumpFile], cache_dir: str = MRT_CACHE_DIR, workers: int = 8) -> list[str]:
+    """Download dumps concurrently (I/O bound, so threads); already cached files are skipped."""
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return list(pool.map(lambda unit: fetch_dump(unit, cache_dir), units))
+
+def cached_dumps(collector: str, from_time, until_time, record_type: str = "ribs",
+                 cache_dir: str = MRT_CACHE_DIR) -> list[DumpFile]:
+    """
+    Cached dumps of a collector overlapping the window, in time order (no
+    network access). Their `url` is the local file path.
+    """
+    start, end = to_epoch(from_time), to_epoch(until_time)
+    folder = os.path.join(cache_dir, collector, record_type)
+    if not os.path.isdir(folder):
+        return []
+    units = []
+    for name in os.listdir(folder):
+        match = _CACHED_NAME.match(name)
+        if not match or name.endswith(".part"):
+            continue
+        initial_time, duration = int(match.group(1)), int(match.group(2))
+        if initial_time <= end and initial_time + duration >= start:
+            units.append(DumpFile(collector, record_type, os.path.join(folder, name), initial_time, duration))
+    return sorted(units, key=lambda unit: unit.initial_time)
+
+class _CollectorRecord:
+    """A record read from a cached file, labelled with the collector it came from."""
+    def __init__(self, record, collector: str):
+        self._record = record
+        self.collector = collector
+
+    def __iter__(self):
+        return iter(self._record)
+
+    def __getattr__(self, name):
+        return getattr(self._record, name)
+
+class LocalDumpStream:
+    """Reads a list of cached dumps in order through the singlefile interface, like one BGPStream."""
+    def __init__(self, units: list[DumpFile], from_time, until_time, record_type: str = "ribs", filter=None):
+        self.units = units
+        self.from_time = from_time
+        self.until_time = until_time
+        self.record_type = record_type
+        self.filter = filter
+
+    def records(self):
+        option = "rib-file" if self.record_type == "ribs" else "upd-file"
+        for unit in self.units:
+            stream = pybgpstream.BGPStream(
+                from_time=self.from_time,
+                until_time=self.until_time,
+                record_type=self.record_type,
+                filter=self.filter,
+                data_interface="singlefile",
+            )
+            stream.set_data_interface_option("singlefile", option, unit.url)
+            for rec in stream.records():
+                yield _CollectorRecord(rec, unit.collector)
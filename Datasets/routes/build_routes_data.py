@@ -1,161 +1,219 @@
+import os
 import json
 import pybgpstream
-from collections import defaultdict
+from itertools import groupby
 from ipaddress import ip_network
 import pickle
+from datasets.bgpstream_preparation import scan_ribs, map_collectors, PrefixOriginSink
+from datasets.collector_registry import open_stream
+from datasets.mrt_cache import to_epoch
+from tools.routes.communities_aux import CommunityAggregator
+from tools.routes.sketch_aux import SpaceSaving
+from tools.routes import routes_aux
+from tools.routes.moas_aux import MOAS_FROM_TIME, MOAS_INDEX_PATH, MOAS_UNTIL_TIME, MoasIndex, get_moas_index
+from tools.rpki.rpki_aux import VRP_PATH, RemoteRpkiClient, get_rpki_validator
 
 
 # Moas Analysis
 # Return all MOAS prefixes and their ASNs in a time interval
-def return_moas_prefixes_and_asns():
-    stream = pybgpstream.BGPStream(
-        from_time="2024-08-01 07:50:00",
-        until_time="2024-08-01 08:10:00",
-        collectors=["rrc00"],
-        record_type="ribs",
-    )
-
-    prefix_origin = defaultdict(set)
-    for rec in stream.records():
-        for elem in rec:
-            pfx = elem.fields["prefix"]
-            ases = elem.fields["as-path"].split(" ")
-            if len(ases) > 0:
-                origin = ases[-1]
-                prefix_origin[pfx].add(origin)
-
-    moas_prefixes = []
-    for pfx in prefix_origin:
-        if len(prefix_origin[pfx]) > 1:
-            print((pfx, ",".join(prefix_origin[pfx])))
-            moas_prefixes.append([pfx, prefix_origin[pfx]])
+def return_moas_prefixes_and_asns(from_time=MOAS_FROM_TIME,
+                                  until_time=MOAS_UNTIL_TIME,
+                                  collectors=["rrc00"],
+                                  prefix_origin_sink=None):
+    """
+    Pass the PrefixOriginSink of an earlier scan_ribs pass (e.g. one that also
+    built the AS graph) as `prefix_origin_sink` to avoid re-streaming the RIBs.
+    """
+    if prefix_origin_sink is None:
+        prefix_origin_sink, = scan_ribs(from_time, until_time, [PrefixOriginSink()], collectors=collectors)
+
+    moas_prefixes = prefix_origin_sink.moas_prefixes()
+    for pfx, origins in moas_prefixes:
+        print((pfx, ",".join(origins)))
     return moas_prefixes
 
-def moas_prefixes_for_asn(target_asn):
-    # Create a BGPStream instance.
-    # You can adjust the time interval, collector(s), or record_type as needed.
-    stream = pybgpstream.BGPStream(
-        from_time="2015-08-01 07:50:00",
-        until_time="2015-08-01 08:10:00",
-        collectors=["rrc00"],
-        record_type="ribs",
-    )
-
-    # Dictionary to hold prefix -> set of origin ASNs.
-    prefix_origin = defaultdict(set)
-
-    # Iterate over all records and their elements.
-    for rec in stream.records():
-        for elem in rec:
-            pfx = elem.fields.get("prefix")
-            if not pfx:
-                continue
-
-            # Split the AS-path string into individual ASNs.
-            ases = elem.fields.get("as-path", "").split(" ")
-            if not ases or ases == [""]:
-                continue
-
-            # The origin ASN is the last element in the AS-path.
-            origin = ases[-1]
-            prefix_origin[pfx].add(origin)
-    moas = []
-    # Print prefixes that are MOAS (announced by >1 origin)
+# Build the persisted MOAS index of one RIB snapshot (prefix -> origins and
+# origin -> MOAS prefixes) that the routes tools answer from
+def build_moas_index(from_time=MOAS_FROM_TIME,
+                     until_time=MOAS_UNTIL_TIME,
+                     collectors=["rrc00"],
+                     index_path=MOAS_INDEX_PATH,
+                     prefix_origin_sink=None):
+    if prefix_origin_sink is None:
+        prefix_origin_sink, = scan_ribs(from_time, until_time, [PrefixOriginSink()], collectors=collectors)
+    snapshot = {"from_time": from_time, "until_time": until_time, "collectors": list(collectors)}
+    index = MoasIndex(prefix_origin_sink.prefix_origin, snapshot)
+    index.save(index_path)
+    return index
+
+def moas_index_path(from_time, until_time, index_path=MOAS_INDEX_PATH):
+    # The default window uses the index the routes tools read; other windows get their own file
+    window = (to_epoch(from_time), to_epoch(until_time))
+    if window == (to_epoch(MOAS_FROM_TIME), to_epoch(MOAS_UNTIL_TIME)):
+        return index_path
+    root, ext = os.path.splitext(index_path)
+    return f"{root}_{window[0]}_{window[1]}{ext}"
+
+def _ensure_moas_index(from_time=None, until_time=None, index_path=MOAS_INDEX_PATH):
+    # Build the index only once per window; every later call is a lookup
+    from_time, until_time = from_time or MOAS_FROM_TIME, until_time or MOAS_UNTIL_TIME
+    path = moas_index_path(from_time, until_time, index_path)
+    if os.path.exists(path):
+        snapshot = get_moas_index(path).snapshot
+        if (snapshot.get("from_time") and snapshot.get("until_time")
+                and to_epoch(snapshot["from_time"]) == to_epoch(from_time)
+                and to_epoch(snapshot["until_time"]) == to_epoch(until_time)):
+            return path
+    build_moas_index(from_time, until_time, index_path=path)
+    get_moas_index(path, reload=True)
+    return path
+
+def moas_prefixes_for_asn(target_asn, from_time=None, until_time=None, index_path=MOAS_INDEX_PATH):
+    # Return the prefixes that are MOAS (announced by >1 origin)
     # and that include the target ASN.
+    moas = routes_aux.moas_prefixes_for_asn(target_asn, _ensure_moas_index(from_time, until_time, index_path))
     print(f"MOAS prefixes that include ASN {target_asn}:")
-    for pfx, origins in prefix_origin.items():
-        if len(origins) > 1 and target_asn in origins:
-            print(f"{pfx} -> Origins: {', '.join(origins)}")
-            moas.append(pfx)
+    for pfx in moas:
+        print(pfx)
     return moas
-    
+
 # Check if a prefix is a MOAS in a time interval
-def check_if_prefix_is_moas_bgp_stream(prefix, from_time, until_time):
-    collectors = ["rrc00"]
-    moas_prefixes = return_moas_prefixes_and_asns()
-    asns = moas_prefixes[prefix]
-    if len(asns) > 1:
-        return (True, asns)
-    else:
-        return (False, asns)
+def check_if_prefix_is_moas_bgp_stream(prefix, from_time=None, until_time=None, index_path=MOAS_INDEX_PATH):
+    return routes_aux.check_if_prefix_is_moas_bgp_stream(prefix, _ensure_moas_index(from_time, until_time, index_path))
 
 # RPKI
-def get_bgp_stream_rpki_data():
-    stream = BGPStream(project="routeviews-stream", filter="router amsix")
+# Validate the announcements of a live stream. Announcements are validated in
+# batches against a local VRP dump (routinator / rpki-client JSON export);
+# without one, the RouteViews RPKI API is queried once per distinct prefix
+# per batch, with results cached across batches.
+def get_bgp_stream_rpki_data(vrp_path=VRP_PATH, batch_size=1000, max_announcements=None,
+                             project="routeviews-stream", filter="router amsix"):
+    stream = pybgpstream.BGPStream(project=project, filter=filter)
+    # Both backends return the same "valid" / "invalid" / "not-found" states
+    validator = get_rpki_validator(vrp_path) if os.path.exists(vrp_path) else RemoteRpkiClient()
     rpki_data = []
+    batch = []
+
+    def flush():
+        states = validator.validate_many((prefix, origin) for prefix, origin, _ in batch)
+        for (prefix, origin, timestamp), state in zip(batch, states):
+            rpki_data.append(json.dumps({"prefix": prefix, "origin": origin, "rpki": state,
+                                         "timestamp": timestamp}))
+        batch.clear()
+
     counter = 0
     for record in stream.records():
         for elem in record:
-            prefix = ip_network(elem.fields['prefix'])
-            if elem.type == "A":
-                # Lookup RPKI state based on announced route.
-                request = requests.get(f"https://api.routeviews.org/rpki?prefix={prefix}", verify=False)
-                response = request.json()
-                # Skip all None responses
-                if response[str(prefix)] is not None:
-                    data = {
-                        "prefix": str(prefix),
-                        "rpki": response[str(prefix)],
-                        "timestamp": response[str(prefix)]['timestamp']
-                    }
-                    # Output json to stdout
-                    rpki_data.append(json.dumps(data))
+            if elem.type != "A":
+                continue
+            ases = elem.fields.get("as-path", "").split()
+            if not ases:
+                continue
+            prefix = str(ip_network(elem.fields['prefix']))
+            batch.append((prefix, ases[-1], elem.time))
+            counter += 1
+            if len(batch) >= batch_size:
+                flush()
+            if max_announcements is not None and counter >= max_announcements:
+                flush()
+                return rpki_data
+    flush()
+    return rpki_data
 
 # More aux functions
-# Identify the top 10 AS paths with the highest number of transits of IPv4 prefixes originated from ASN xxxx
-def get_top_x_transit_asns(prefix, asn, x, from_time, until_time, collectors):
-    stream = pybgpstream.BGPStream(
-        from_time=from_time,
-        until_time=until_time,
-        collectors=collectors,
-        record_type="updates",
-        filter='''prefix''' + prefix + '''and ipversion 4 and path \"_''' + asn + '''_\" '''
-    )
-
-    as_paths = []
-
+def transit_paths_filter(prefix=None, asn=None, ipversion=4):
+    terms = []
+    if prefix:
+        terms.append(f"prefix more {prefix}")
+    if ipversion:
+        terms.append(f"ipversion {ipversion}")
+    if asn is not None:
+        # Paths originated by the ASN
+        terms.append(f'path "_{asn}$"')
+    return " and ".join(terms)
+
+def scan_collector_transit_paths(collector, from_time, until_time, max_rows_per_collector=None,
+                                 filter=None, capacity=1000):
+    """Space-Saving summary of the (prepend-free) AS paths announced in one collector's updates."""
+    heavy_hitters = SpaceSaving(capacity)
+    stream = open_stream(from_time, until_time, [collector], "updates", filter)
+    row_count = 0
     for rec in stream.records():
         for elem in rec:
-            if elem.type == "A":
-                as_paths.append(elem.fields["as-path"])
-
-    top_x_paths = Counter(as_paths).most_common(x)
+            if elem.type != "A":
+                continue
+            as_path = [k for k, _ in groupby(elem.fields.get("as-path", "").split())]
+            if not as_path:
+                continue
+            heavy_hitters.add(" ".join(as_path))
+            row_count += 1
+            if max_rows_per_collector is not None and row_count >= max_rows_per_collector:
+                return heavy_hitters
+    return heavy_hitters
+
+# Identify the top x AS paths with the highest number of transits of IPv4 prefixes originated from ASN xxxx
+def get_top_x_transit_asns(prefix, asn, x, from_time, until_time, collectors, capacity=1000,
+                           workers=None, max_rows_per_collector=None):
+    """
+    Return (top_x_paths, transits): the x most announced AS paths (prepending
+    removed) as (path, count) pairs, and the number of transit ASes on each
+    (every AS but the peer and the origin). Paths are counted with a
+    Space-Saving summary of `capacity` entries per collector, so memory stays
+    fixed over long windows; counts are upper bounds, exact for the paths
+    seen more than total / capacity times.
+    """
+    filter = transit_paths_filter(prefix, asn)
+    heavy_hitters = SpaceSaving(max(capacity, x))
+    for partial in map_collectors(scan_collector_transit_paths, from_time, until_time, max_rows_per_collector,
+                                  workers, collectors, extra_args=(filter, max(capacity, x)),
+                                  record_type="updates"):
+        heavy_hitters.merge(partial)
+
+    top_x_paths = [(path, count) for path, count, _ in heavy_hitters.top(x)]
 
     # Calculate number of transits
-    transits = []
-    for path in top_x_paths:
-        transits.append(len(path[0].split()) - 2)
+    transits = [max(0, len(path.split()) - 2) for path, _ in top_x_paths]
 
-    print(f"Top x AS paths with the highest number of transits for IPv4 prefix ayde-11 originated from AS 6810: {top_10_paths}")
+    print(f"Top {x} AS paths with the highest number of transits for IPv4 prefix {prefix} originated from AS {asn}: {top_x_paths}")
     print(f"Number of transits: {transits}")
-    return transits
+    return top_x_paths, transits
 
 # Get all BGP Communities detected in time interval
-def get_bgp_communities_info(from_time, until_time, collectors, filter=None):
-    stream = pybgpstream.BGPStream(
-      # Consider this time interval:
-      # Sat, 01 Aug 2015 7:50:00 GMT -  08:10:00 GMT
-      from_time=from_time,
-      until_time=until_time,
-      collectors=collectors,
-      record_type="ribs",
-    )
-    if filter:
-      stream.filter=filter
-    # <community, prefix > dictionary
-    community_prefix = defaultdict(set)
-
-    # Get next record
+def scan_collector_communities(collector, from_time, until_time, max_rows_per_collector=None,
+                               filter=None, aggregator=None):
+    """Stream one collector's RIB into a fresh copy of `aggregator`."""
+    aggregator = aggregator.empty() if aggregator is not None else CommunityAggregator()
+    stream = open_stream(from_time, until_time, [collector], "ribs", filter)
+    row_count = 0
     for rec in stream.records():
         for elem in rec:
-            # Get the prefix
-            pfx = elem.fields['prefix']
-            # Get the associated communities
-            communities = elem.fields['communities']
-            # for each community save the set of prefixes
-            # that are affected
-            for c in communities:
-                community_prefix[c].add(pfx)
+            # Save, for each community, the prefixes that are affected
+            aggregator.add(elem.fields['prefix'], elem.fields.get('communities', ()))
+            row_count += 1
+            if max_rows_per_collector is not None and row_count >= max_rows_per_collector:
+                aggregator.flush()
+                return aggregator
+    aggregator.flush()
+    return aggregator
+
+def get_bgp_communities_info(from_time, until_time, collectors, filter=None, exact=True, spill_dir=None,
+                             workers=None, max_rows_per_collector=None):
+    """
+    Return a <community, prefixes> CommunityAggregator, which reads like the
+    old community -> set(prefix) dict (`for c in communities: communities[c]`)
+    but holds prefixes as interned integer pairs, optionally spilled to
+    `spill_dir`. With `exact=False` only HyperLogLog prefix counts are kept,
+    so memory no longer grows with the RIB size; rank communities with
+    `.top_k(k, by="prefixes" | "announcements")`.
+    Collectors are scanned in parallel and merged.
+    """
+    # Consider e.g. this time interval:
+    # Sat, 01 Aug 2015 7:50:00 GMT -  08:10:00 GMT
+    community_prefix = CommunityAggregator(exact=exact, spill_dir=spill_dir)
+    for partial in map_collectors(scan_collector_communities, from_time, until_time, max_rows_per_collector,
+                                  workers, collectors, extra_args=(filter, community_prefix)):
+        community_prefix.merge(partial)
+        partial.close()
     return community_prefix
 
 def load_graph_from_pickle(pickle_filename):
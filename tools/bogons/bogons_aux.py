@@ -1,38 +1,433 @@
+import os
+import time
+import socket
+import operator
+import random
+import itertools
+from itertools import repeat
+import threading
 import requests
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta, time
+from bisect import bisect_right
+from datetime import datetime, timedelta
 from collections import defaultdict
 import ipaddress
 
-# Check if an IP address or a prefix is bogon
-def is_bogon(prefix):
-    # List of well-known bogon prefixes
-    bogon_prefixes = [
-        "0.0.0.0/8", "10.0.0.0/8", "100.64.0.0/10", "127.0.0.0/8", "169.254.0.0/16",
-        "172.16.0.0/12", "192.0.2.0/24", "192.88.99.0/24", "192.168.0.0/16", "198.18.0.0/15",
-        "198.51.100.0/24", "203.0.113.0/24", "224.0.0.0/4", "240.0.0.0/4"
-    ]
+# List of well-known bogon prefixes
+BOGON_PREFIXES = [
+    "0.0.0.0/8", "10.0.0.0/8", "100.64.0.0/10", "127.0.0.0/8", "169.254.0.0/16",
+    "172.16.0.0/12", "192.0.2.0/24", "192.88.99.0/24", "192.168.0.0/16", "198.18.0.0/15",
+    "198.51.100.0/24", "203.0.113.0/24", "224.0.0.0/4", "240.0.0.0/4"
+]
+
+# Special-purpose IPv6 space that must never be routed (RFC 6890 and the IANA
+# special-purpose registry): unspecified / loopback / IPv4-mapped (::/8),
+# discard-only, benchmarking, ORCHID, documentation, 6to4, the old 6bone,
+# SRv6 SIDs, unique local, link local, site local and multicast
+BOGON_PREFIXES_V6 = [
+    "::/8", "100::/64", "2001:2::/48", "2001:10::/28", "2001:db8::/32", "2002::/16",
+    "3ffe::/16", "3fff::/20", "5f00::/16", "fc00::/7", "fe80::/10", "fec0::/10", "ff00::/8"
+]
+
+# Team Cymru full bogon lists and the local snapshots they are cached in
+FULLBOGONS_URLS = {
+    4: "https://www.team-cymru.org/Services/Bogons/fullbogons-ipv4.txt",
+    6: "https://www.team-cymru.org/Services/Bogons/fullbogons-ipv6.txt",
+}
+FULLBOGONS_SNAPSHOTS = {
+    4: 'tools/bogons/fullbogons-ipv4.txt',
+    6: 'tools/bogons/fullbogons-ipv6.txt',
+}
+# Team Cymru regenerates the lists every 4 hours
+FULLBOGONS_TTL = 4 * 3600
+
+# Bogon space as sorted, disjoint address blocks per IP version. Blocks nested
+# in another block are dropped, so a prefix is a bogon iff the last block
+# starting at or before the prefix's last address ends at or after its first
+# address: one binary search per prefix, scalar (bisect) or vectorized
+# (np.searchsorted). IPv6 addresses are searched as big-endian (high, low)
+# uint64 pairs, which NumPy compares lexicographically.
+_V6_KEY = np.dtype([("hi", ">u8"), ("lo", ">u8")])
+# Separators of one "a.b.c.d/len\n" line, in order
+_V4_SEPARATOR_CODES = np.frombuffer(b".../\n", dtype=np.uint8)
+_V4_SEPARATORS = bytes.maketrans(b"./\n", b"   ")
+_MASK64 = (1 << 64) - 1
+_LABELS = ["Bogon", "Non-Bogon", "Invalid"]
+_BOGON, _NON_BOGON, _INVALID = range(3)
+
+def _v6_keys(hi: np.ndarray, lo: np.ndarray) -> np.ndarray:
+    keys = np.empty(len(hi), dtype=_V6_KEY)
+    keys["hi"], keys["lo"] = hi, lo
+    return keys
+
+def _v6_ints_to_keys(values) -> np.ndarray:
+    values = list(values)
+    return _v6_keys(np.array([v >> 64 for v in values], dtype=np.uint64),
+                    np.array([v & _MASK64 for v in values], dtype=np.uint64))
+
+def _greater_equal(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    if a.dtype == _V6_KEY:
+        return (a["hi"] > b["hi"]) | ((a["hi"] == b["hi"]) & (a["lo"] >= b["lo"]))
+    return a >= b
+
+def _host_mask64(bits: np.ndarray) -> np.ndarray:
+    """Mask of the low `bits` bits (0..64) of a uint64."""
+    bits = np.asarray(bits, dtype=np.int64)
+    partial = (np.uint64(1) << np.minimum(bits, 63).astype(np.uint64)) - np.uint64(1)
+    return np.where(bits >= 64, np.uint64(_MASK64), partial)
+
+def _is_v4_prefix_text(text: bytes) -> bool:
+    """True if every line of `text` is a.b.c.d/len (digits only, no empty fields)."""
+    chars = np.frombuffer(text, dtype=np.uint8)
+    is_sep = (chars == ord(".")) | (chars == ord("/")) | (chars == ord("\n"))
+    if not len(chars) or is_sep[0] or (is_sep[1:] & is_sep[:-1]).any():
+        return False
+    if not (is_sep | ((chars >= ord("0")) & (chars <= ord("9")))).all():
+        return False
+    seps = chars[is_sep]
+    return len(seps) % 5 == 0 and bool((seps.reshape(-1, 5) == _V4_SEPARATOR_CODES).all())
+
+def _parse_v4(lines: list) -> tuple:
+    """IPv4 prefixes / addresses -> (first address, last address, valid) uint64 arrays."""
+    text = "\n".join(lines) + "\n"
+    if text.count("/") != len(lines):
+        # Addresses are /32 prefixes
+        text = "\n".join(line if "/" in line else line + "/32" for line in lines) + "\n"
+    text = text.encode("ascii", "replace")
+    if _is_v4_prefix_text(text):
+        fields = np.fromstring(text.translate(_V4_SEPARATORS), dtype=np.int64, sep=" ").reshape(-1, 5)
+    else:
+        # Some line is malformed: parse line by line
+        rows = []
+        for line in lines:
+            line = ((line if "/" in line else line + "/32") + "\n").encode("ascii", "replace")
+            rows.append([int(x) for x in line.translate(_V4_SEPARATORS).split()]
+                        if _is_v4_prefix_text(line) else [-1] * 5)
+        fields = np.array(rows, dtype=np.int64).reshape(-1, 5)
+    valid = ((fields[:, :4] >= 0) & (fields[:, :4] <= 255)).all(axis=1) & (fields[:, 4] >= 0) & (fields[:, 4] <= 32)
+    fields = np.where(valid[:, None], fields, 0).astype(np.uint64)
+    addr = (fields[:, 0] << np.uint64(24)) | (fields[:, 1] << np.uint64(16)) | (fields[:, 2] << np.uint64(8)) | fields[:, 3]
+    return _v4_ranges(addr, np.where(valid, fields[:, 4].astype(np.int64), 32)) + (valid,)
+
+def _v4_ranges(addr: np.ndarray, lengths: np.ndarray) -> tuple:
+    """(first, last) addresses of IPv4 prefixes given as integer addresses and lengths."""
+    host = _host_mask64(32 - lengths)
+    start = addr & ~host
+    return start, start | host
+
+def _v6_ranges(words: np.ndarray, lengths: np.ndarray) -> tuple:
+    """(first, last) _V6_KEY arrays of IPv6 prefixes given as (high, low) uint64 words and lengths."""
+    host_bits = 128 - lengths
+    host_hi = _host_mask64(np.clip(host_bits - 64, 0, 64))
+    host_lo = _host_mask64(np.minimum(host_bits, 64))
+    hi, lo = words[:, 0] & ~host_hi, words[:, 1] & ~host_lo
+    return _v6_keys(hi, lo), _v6_keys(hi | host_hi, lo | host_lo)
+
+def _parse_v6(lines: list) -> tuple:
+    """IPv6 prefixes / addresses -> (first address, last address) as _V6_KEY arrays, and valid."""
+    blob = bytearray()
+    lengths = np.full(len(lines), -1, dtype=np.int64)
+    for k, line in enumerate(lines):
+        addr, _, length = line.partition("/")
+        try:
+            packed = socket.inet_pton(socket.AF_INET6, addr)
+            length = int(length) if length else 128
+        except (OSError, ValueError):
+            packed, length = bytes(16), -1
+        blob += packed
+        if 0 <= length <= 128:
+            lengths[k] = length
+    words = np.frombuffer(bytes(blob), dtype=">u8").reshape(-1, 2).astype(np.uint64)
+    valid = lengths >= 0
+    return _v6_ranges(words, np.where(valid, lengths, 128)) + (valid,)
+
+class BogonMatcher:
+    def __init__(self, prefixes):
+        ranges = {4: [], 6: []}
+        for prefix in prefixes:
+            net = ipaddress.ip_network(str(prefix).strip(), strict=False)
+            ranges[net.version].append((int(net.network_address), int(net.broadcast_address), str(net)))
+        self.starts, self.ends, self.blocks = {}, {}, {}
+        for version, intervals in ranges.items():
+            starts, ends, blocks = [], [], []
+            # Least specific first among equal starts, so nested blocks are skipped
+            for start, end, block in sorted(intervals, key=lambda r: (r[0], -r[1])):
+                if ends and end <= ends[-1]:
+                    continue
+                starts.append(start)
+                ends.append(end)
+                blocks.append(block)
+            self.starts[version], self.ends[version], self.blocks[version] = starts, ends, blocks
+        self._arrays = {
+            4: (np.array(self.starts[4], dtype=np.uint64), np.array(self.ends[4], dtype=np.uint64)),
+            6: (_v6_ints_to_keys(self.starts[6]), _v6_ints_to_keys(self.ends[6])),
+        }
+
+    def __len__(self) -> int:
+        return len(self.starts[4]) + len(self.starts[6])
+
+    def match(self, prefix):
+        """The bogon block the prefix (or IP address) overlaps, or None."""
+        net = ipaddress.ip_network(str(prefix).strip(), strict=False)
+        starts, ends = self.starts[net.version], self.ends[net.version]
+        i = bisect_right(starts, int(net.broadcast_address)) - 1
+        if i >= 0 and ends[i] >= int(net.network_address):
+            return self.blocks[net.version][i]
+        return None
+
+    def overlaps(self, prefix) -> bool:
+        """True if the prefix (or IP address) overlaps bogon space."""
+        return self.match(prefix) is not None
 
-    # Fetch bogon prefixes from Internet Yellow Pages (Team Cymru)
-    bogons = fetch_bogons()
-    bogon_prefixes.extend(bogons)
+    def complement(self, version: int) -> list:
+        """The address space outside every bogon block, as sorted inclusive (start, end) integer intervals."""
+        gaps, nxt = [], 0
+        for start, end in zip(self.starts[version], self.ends[version]):
+            if start > nxt:
+                gaps.append((nxt, start - 1))
+            nxt = end + 1
+        last = (1 << (32 if version == 4 else 128)) - 1
+        if nxt <= last:
+            gaps.append((nxt, last))
+        return gaps
 
-    prefix_network = ipaddress.ip_network(prefix, strict=False)
+    def _match_ranges(self, version: int, first: np.ndarray, last: np.ndarray) -> np.ndarray:
+        """Index of the overlapped block for every (first, last) range, -1 if none."""
+        starts, ends = self._arrays[version]
+        if not len(starts):
+            return np.full(len(first), -1, dtype=np.int64)
+        idx = np.searchsorted(starts, last, side="right") - 1
+        hit = (idx >= 0) & _greater_equal(ends[np.maximum(idx, 0)], first)
+        return np.where(hit, idx, -1)
 
-    for bogon in bogon_prefixes:
-        if prefix_network.overlaps(ipaddress.ip_network(bogon)):
-            return True  # The prefix is a bogon
+    def _labels(self, codes: np.ndarray, block_codes: np.ndarray, blocks: list) -> dict:
+        # Categoricals are built from integer codes, without a Python object per row
+        return {
+            "label": pd.Categorical.from_codes(codes, _LABELS),
+            "bogon_block": pd.Categorical.from_codes(block_codes, blocks),
+        }
 
-    return False  # The prefix is not a bogon
+    def classify(self, prefixes) -> pd.DataFrame:
+        """
+        Vectorized bogon check of many prefixes / addresses (an iterable, or
+        the path of a file with one per line). Returns a DataFrame with the
+        prefix, its label ("Bogon", "Non-Bogon" or "Invalid") and the matched
+        bogon block (missing for non-bogons and invalid lines).
+        """
+        if isinstance(prefixes, (str, os.PathLike)):
+            with open(prefixes, "r", encoding="utf-8") as f:
+                lines = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        else:
+            lines = list(map(str.strip, map(str, prefixes)))
+        is_v6 = np.fromiter(map(operator.contains, lines, repeat(":")), dtype=bool, count=len(lines))
+        codes = np.full(len(lines), _INVALID, dtype=np.int8)
+        block_codes = np.full(len(lines), -1, dtype=np.int64)
+        offset = {4: 0, 6: len(self.blocks[4])}
+        for version, rows in ((4, np.flatnonzero(~is_v6)), (6, np.flatnonzero(is_v6))):
+            if not len(rows):
+                continue
+            subset = lines if len(rows) == len(lines) else [lines[k] for k in rows.tolist()]
+            first, last, valid = _parse_v4(subset) if version == 4 else _parse_v6(subset)
+            idx = self._match_ranges(version, first, last)
+            codes[rows] = np.where(~valid, _INVALID, np.where(idx >= 0, _BOGON, _NON_BOGON))
+            block_codes[rows] = np.where(valid & (idx >= 0), idx + offset[version], -1)
+        return pd.DataFrame({"prefix": lines,
+                             **self._labels(codes, block_codes, self.blocks[4] + self.blocks[6])})
 
+    def classify_addresses(self, addresses, lengths=None, version: int = 4) -> pd.DataFrame:
+        """
+        classify for prefixes already in integer form, with no text parsing:
+        IPv4 network addresses as integers, or IPv6 ones as an (n, 2) array
+        of their high and low 64 bits, plus their prefix lengths (default:
+        single addresses). Returns the label and bogon block of every row.
+        """
+        bits = 32 if version == 4 else 128
+        words = np.asarray(addresses, dtype=np.uint64)
+        n = len(words)
+        lengths = np.full(n, bits, dtype=np.int64) if lengths is None else np.asarray(lengths, dtype=np.int64)
+        valid = (lengths >= 0) & (lengths <= bits)
+        lengths = np.where(valid, lengths, bits)
+        if version == 4:
+            valid &= words <= np.uint64(0xFFFFFFFF)
+            first, last = _v4_ranges(words, lengths)
+        else:
+            first, last = _v6_ranges(words.reshape(-1, 2), lengths)
+        idx = self._match_ranges(version, first, last)
+        codes = np.where(~valid, _INVALID, np.where(idx >= 0, _BOGON, _NON_BOGON)).astype(np.int8)
+        return pd.DataFrame(self._labels(codes, np.where(valid, idx, -1), self.blocks[version]))
 
-def fetch_bogons():
-    url = "https://www.team-cymru.org/Services/Bogons/fullbogons-ipv4.txt"
+def parse_bogon_lines(lines, version=None) -> list:
+    """Valid prefixes of a bogon list (comments and blank lines skipped), optionally of one IP version."""
+    prefixes = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            net = ipaddress.ip_network(line, strict=False)
+        except ValueError:
+            print(f"[!] Invalid prefix skipped: {line}")
+            continue
+        if version is None or net.version == version:
+            prefixes.append(line)
+    return prefixes
+
+def fetch_bogons(version=4):
+    url = FULLBOGONS_URLS[version]
     try:
         response = requests.get(url, timeout=5)
         if response.status_code == 200:
-            return [line.strip() for line in response.text.split('\n') if line and not line.startswith('#')]
+            return parse_bogon_lines(response.text.splitlines(), version)
     except requests.RequestException:
         pass  # If the request fails, we return an empty list
     return []
+
+def refresh_bogon_snapshots(snapshots=FULLBOGONS_SNAPSHOTS) -> dict | None:
+    """
+    Download the full bogon lists into the local snapshots. Returns the
+    downloaded lists (also when a snapshot cannot be written, e.g. on a
+    read-only checkout), or None if a download fails (the old files are kept).
+    """
+    fetched = {version: fetch_bogons(version) for version in snapshots}
+    if not all(fetched.values()):
+        return None
+    for version, bogons in fetched.items():
+        path = snapshots[version]
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(bogons) + "\n")
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[!] Could not write bogon snapshot {path}: {e}")
+    return fetched
+
+def load_fullbogons(version: int, snapshots=FULLBOGONS_SNAPSHOTS) -> list:
+    """Full bogon list of one IP version from its snapshot (downloaded first if missing)."""
+    if not os.path.exists(snapshots[version]):
+        fetched = refresh_bogon_snapshots(snapshots)
+        if fetched:
+            return fetched[version]
+        return []
+    with open(snapshots[version], "r", encoding="utf-8") as f:
+        return parse_bogon_lines(f, version)
+
+def _matcher_from_lists(fullbogons: dict) -> BogonMatcher:
+    return BogonMatcher(BOGON_PREFIXES + BOGON_PREFIXES_V6 + [p for bogons in fullbogons.values() for p in bogons])
+
+def load_bogon_matcher(snapshots=FULLBOGONS_SNAPSHOTS) -> BogonMatcher:
+    """Matcher over the well-known IPv4 and IPv6 bogons plus the full bogon snapshots that can be read."""
+    fullbogons = {}
+    for version, path in snapshots.items():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                fullbogons[version] = parse_bogon_lines(f, version)
+        except OSError:
+            pass
+    return _matcher_from_lists(fullbogons)
+
+def _snapshot_mtime(snapshots=FULLBOGONS_SNAPSHOTS) -> float | None:
+    if not all(os.path.exists(path) for path in snapshots.values()):
+        return None
+    return min(os.path.getmtime(path) for path in snapshots.values())
+
+# Retry interval after a failed background refresh
+_RETRY_INTERVAL = 600
+
+_matcher = None
+_next_refresh = 0.0
+_matcher_lock = threading.Lock()
+_refreshing = threading.Event()
+
+def _refresh_in_background(ttl: float):
+    global _matcher, _next_refresh
+    try:
+        fetched = refresh_bogon_snapshots()
+        if not fetched:
+            raise RuntimeError("download failed")
+        _matcher = _matcher_from_lists(fetched)
+        _next_refresh = time.time() + ttl
+    except Exception as e:
+        print(f"[!] Bogon list refresh failed ({e}); retrying in {_RETRY_INTERVAL} s")
+        _next_refresh = time.time() + _RETRY_INTERVAL
+    finally:
+        _refreshing.clear()
+
+def get_bogon_matcher(ttl: float = FULLBOGONS_TTL) -> BogonMatcher:
+    """
+    Return the shared matcher. It is built from the local snapshots once
+    (downloading the lists first if there are none, and keeping them in
+    memory if they cannot be saved); once they are older than `ttl` they are
+    refreshed in a background thread and the matcher is swapped when the
+    download completes, so lookups never wait on the network. Without any
+    list the matcher covers the well-known bogons only.
+    """
+    global _matcher, _next_refresh
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                mtime = _snapshot_mtime()
+                fetched = refresh_bogon_snapshots() if mtime is None else None
+                if fetched:
+                    _next_refresh = time.time() + ttl
+                    _matcher = _matcher_from_lists(fetched)
+                else:
+                    _next_refresh = mtime + ttl if mtime is not None else time.time() + _RETRY_INTERVAL
+                    _matcher = load_bogon_matcher()
+    if time.time() >= _next_refresh and not _refreshing.is_set():
+        _refreshing.set()
+        threading.Thread(target=_refresh_in_background, args=(ttl,), daemon=True).start()
+    return _matcher
+
+# Check if an IP address or a prefix is bogon
+def is_bogon(prefix):
+    return get_bogon_matcher().overlaps(prefix)
+
+# Classify many prefixes at once (e.g. a full routing table audit)
+def classify_bogons(prefixes) -> pd.DataFrame:
+    return get_bogon_matcher().classify(prefixes)
+
+# Uniform sampler of prefixes that do not overlap bogon space.
+# For every prefix length the prefix-aligned blocks that fit in the complement
+# of the bogons are counted per complement interval (cumulative counts), so a
+# draw is: pick a length, pick a block index uniformly and bisect it back to
+# its interval. No candidate is ever rejected. Lengths are weighted like
+# rejection sampling over uniform lengths would weight them (by the clean
+# share of each length), so datasets keep their former distribution.
+class NonBogonSampler:
+    def __init__(self, matcher: BogonMatcher, version: int = 4, min_length: int = 8, max_length: int = 30):
+        self.version = version
+        self.bits = 32 if version == 4 else 128
+        gaps = matcher.complement(version)
+        self.lengths, self.first_blocks, self.cum_counts, weights = [], [], [], []
+        for length in range(min_length, max_length + 1):
+            size = 1 << (self.bits - length)
+            first_blocks, cum_counts, total = [], [], 0
+            for start, end in gaps:
+                first, stop = -(-start // size), (end + 1) // size
+                if stop > first:
+                    total += stop - first
+                    first_blocks.append(first)
+                    cum_counts.append(total)
+            if total:
+                self.lengths.append(length)
+                self.first_blocks.append(first_blocks)
+                self.cum_counts.append(cum_counts)
+                weights.append(total / (1 << length))
+        if not self.lengths:
+            raise ValueError(f"No non-bogon IPv{version} prefix of length /{min_length}-/{max_length}")
+        self.cum_weights = list(itertools.accumulate(weights))
+
+    def sample(self, rng=random) -> str:
+        """One random non-bogon prefix."""
+        k = rng.choices(range(len(self.lengths)), cum_weights=self.cum_weights)[0]
+        length, cum_counts = self.lengths[k], self.cum_counts[k]
+        index = rng.randrange(cum_counts[-1])
+        i = bisect_right(cum_counts, index)
+        block = self.first_blocks[k][i] + index - (cum_counts[i - 1] if i else 0)
+        network = ipaddress.ip_network((block << (self.bits - length), length))
+        return str(network)
+
+    def samples(self, n: int, rng=random) -> list:
+        return [self.sample(rng) for _ in range(n)]
@@ -1,6 +1,7 @@
 import requests
-import json
 import pycountry
+# AS Rank records come from the shared cache of as_rank_aux
+from tools.caida.as_rank_aux import get_as_rank_data
 
 URL = 'https://api.data.caida.org/as2org/v1'
 ASRANK_URL = 'https://api.asrank.caida.org/v2/graphql'
@@ -14,50 +15,6 @@ def get_country_iso_code(country_name):
     except LookupError:
         return "Invalid country name"
 
-def get_as_rank_data(asn): 
-    asn_data = """{
-        asn(asn:"%i") {
-            asn
-            asnName
-            rank
-            organization {
-                orgId
-                orgName
-            }
-            cliqueMember
-            seen
-            longitude
-            latitude
-            cone {
-                numberAsns
-                numberPrefixes
-                numberAddresses
-            }
-            country {
-                iso
-                name
-            }
-            asnDegree {
-                provider
-                peer
-                customer
-                total
-                transit
-                sibling
-            }
-            announcing {
-                numberPrefixes
-                numberAddresses
-            }
-        }
-    }""" % (asn)
-    result = requests.post(ASRANK_URL, json={'query':asn_data})
-    if result.status_code == 200:
-        return result.json()
-    else:
-        print ("Query failed to run returned code of %d " % (result.status_code))
-        return -1
-
 # Helper method
 def getJsonResponse(URL):
     response = requests.get(URL)
@@ -1,9 +1,96 @@
 import re
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
 import requests
 
 URL = "https://api.asrank.caida.org/v2/graphql"
+AS_RANK_CACHE_PATH = "tools/caida/as_rank_cache.sqlite"
+AS_RANK_TTL = 24 * 60 * 60
+
+# AS Rank records shared by every caida tool.
+# Each tool reads a different field of the same record, so records are kept
+# per ASN for `ttl` seconds in an in-memory LRU of `max_entries` records and,
+# optionally, in a SQLite file that outlives the process. A record expires
+# after the TTL in both tiers; failed queries are never cached.
+class AsRankCache:
+    def __init__(self, ttl: float = AS_RANK_TTL, max_entries: int = 4096, db_path: str | None = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._records: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS as_rank (asn INTEGER PRIMARY KEY, fetched REAL, record TEXT)")
+            self._conn.commit()
+
+    def _remember(self, asn: int, fetched: float, record: dict):
+        self._records[asn] = (fetched, record)
+        self._records.move_to_end(asn)
+        while len(self._records) > self.max_entries:
+            self._records.popitem(last=False)
+
+    def get(self, asn: int):
+        """The cached record of an ASN, or None if it is missing or expired."""
+        now = time.time()
+        with self._lock:
+            cached = self._records.get(asn)
+            if cached is not None:
+                if now - cached[0] < self.ttl:
+                    self._records.move_to_end(asn)
+                    return cached[1]
+                del self._records[asn]
+            if self._conn is None:
+                return None
+            row = self._conn.execute("SELECT fetched, record FROM as_rank WHERE asn = ?", (asn,)).fetchone()
+            if row is None or now - row[0] >= self.ttl:
+                return None
+            record = json.loads(row[1])
+            self._remember(asn, row[0], record)
+            return record
+
+    def put(self, asn: int, record: dict):
+        now = time.time()
+        with self._lock:
+            self._remember(asn, now, record)
+            if self._conn is not None:
+                self._conn.execute("INSERT OR REPLACE INTO as_rank VALUES (?, ?, ?)", (asn, now, json.dumps(record)))
+                self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM as_rank")
+                self._conn.commit()
+
+_CACHE = None
+
+def get_as_rank_cache() -> AsRankCache:
+    """Return the shared record cache (in memory only until use_as_rank_cache says otherwise)."""
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = AsRankCache()
+    return _CACHE
+
+def use_as_rank_cache(db_path: str | None = AS_RANK_CACHE_PATH, ttl: float = AS_RANK_TTL, max_entries: int = 4096):
+    """Replace the shared cache, e.g. to keep records on disk in `db_path` (None: memory only)."""
+    global _CACHE
+    _CACHE = AsRankCache(ttl, max_entries, db_path)
+    return _CACHE
 
 def get_as_rank_data(asn): 
+    asn = int(asn)
+    cache = get_as_rank_cache()
+    record = cache.get(asn)
+    if record is not None:
+        return record
     asn_data = """{
         asn(asn:"%i") {
             asn
@@ -42,7 +129,10 @@ def get_as_rank_data(asn):
     }""" % (asn)
     result = requests.post(URL,json={'query':asn_data})
     if result.status_code == 200:
-        return result.json()
+        record = result.json()
+        if record.get('data') is not None:
+            cache.put(asn, record)
+        return record
     else:
         print ("Query failed to run returned code of %d " % (result.status_code))
         return -1
@@ -54,4 +144,4 @@ def extract_numbers(text: str):
         return int(matches[0])
     else:
         return -1
-    
\ No newline at end of file
+    
\ No newline at end of file
@@ -0,0 +1,293 @@
+import os
+import time
+import hashlib
+import numpy as np
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+# Array-backed (CSR) undirected AS graph.
+# Nodes are dense int32 ids, `asns[i]` holds the ASN of node i (uint32, since
+# 4-byte ASNs do not fit in int32) and is kept sorted so ASN -> id is a
+# binary search. The neighbours of node i are
+# `neighbors[offsets[i]:offsets[i + 1]]`.
+
+# Read-only on-disk layout used by save_mmap/open_mmap:
+#   magic (8 bytes) | num_nodes (uint64) | num_neighbors (uint64) | sha256 of the payload (32 bytes) | padding to 64
+#   asns (uint32[num_nodes]) | padding to 8 | offsets (int64[num_nodes + 1]) | neighbors (int32[num_neighbors])
+MMAP_MAGIC = b"ASGRAPH1"
+MMAP_HEADER_SIZE = 64
+
+def _mmap_layout(num_nodes: int, num_neighbors: int):
+    asns_at = MMAP_HEADER_SIZE
+    offsets_at = asns_at + 4 * num_nodes
+    offsets_at += -offsets_at % 8
+    neighbors_at = offsets_at + 8 * (num_nodes + 1)
+    return asns_at, offsets_at, neighbors_at
+
+def read_mmap_header(path: str):
+    """Return (num_nodes, num_neighbors, payload_sha256_hex) of a memory-mapped graph file."""
+    with open(path, "rb") as f:
+        header = f.read(MMAP_HEADER_SIZE)
+    if len(header) < MMAP_HEADER_SIZE or header[:8] != MMAP_MAGIC:
+        raise ValueError(f"Not an AS graph file: {path}")
+    num_nodes = int.from_bytes(header[8:16], "little")
+    num_neighbors = int.from_bytes(header[16:24], "little")
+    return num_nodes, num_neighbors, header[24:56].hex()
+
+class CsrAsGraph:
+    def __init__(self, asns: np.ndarray, offsets: np.ndarray, neighbors: np.ndarray):
+        self.asns = asns
+        self.offsets = offsets
+        self.neighbors = neighbors
+
+    @classmethod
+    def from_edges(cls, edges: Iterable[Tuple[Union[int, str], Union[int, str]]]) -> "CsrAsGraph":
+        pairs = np.array([(int(a), int(b)) for a, b in edges], dtype=np.uint32).reshape(-1, 2)
+        return cls.from_edge_array(pairs)
+
+    @classmethod
+    def from_edge_array(cls, pairs: np.ndarray) -> "CsrAsGraph":
+        """Build the graph from an (m, 2) array of ASN pairs (duplicates and self loops are dropped)."""
+        pairs = np.asarray(pairs, dtype=np.uint32).reshape(-1, 2)
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        pairs = np.unique(np.sort(pairs, axis=1), axis=0)
+        asns, ids = np.unique(pairs, return_inverse=True)
+        ids = ids.reshape(-1, 2).astype(np.int32)
+        # Store each undirected edge in both directions, grouped by source node
+        src = np.concatenate([ids[:, 0], ids[:, 1]])
+        dst = np.concatenate([ids[:, 1], ids[:, 0]])
+        order = np.lexsort((dst, src))
+        offsets = np.zeros(len(asns) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(asns)), out=offsets[1:])
+        return cls(asns.astype(np.uint32), offsets, dst[order].astype(np.int32))
+
+    @classmethod
+    def from_networkx(cls, G) -> "CsrAsGraph":
+        return cls.from_edges((a, b) for a, b in G.edges() if str(a).isdigit() and str(b).isdigit())
+
+    def save(self, path: str):
+        np.savez(path, asns=self.asns, offsets=self.offsets, neighbors=self.neighbors)
+
+    @classmethod
+    def load(cls, path: str) -> "CsrAsGraph":
+        with np.load(path) as data:
+            return cls(data["asns"], data["offsets"], data["neighbors"])
+
+    def save_mmap(self, path: str):
+        """
+        Write the graph in the flat memory-mappable format. The file is written
+        next to `path` and atomically renamed, so processes that still map the
+        previous version keep a consistent view.
+        """
+        asns = np.ascontiguousarray(self.asns, dtype="<u4")
+        offsets = np.ascontiguousarray(self.offsets, dtype="<i8")
+        neighbors = np.ascontiguousarray(self.neighbors, dtype="<i4")
+        asns_at, offsets_at, neighbors_at = _mmap_layout(len(asns), len(neighbors))
+        digest = hashlib.sha256()
+        for arr in (asns, offsets, neighbors):
+            digest.update(arr.tobytes())
+        header = (MMAP_MAGIC + len(asns).to_bytes(8, "little") + len(neighbors).to_bytes(8, "little")
+                  + digest.digest())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(header.ljust(MMAP_HEADER_SIZE, b"\0"))
+            f.write(asns.tobytes())
+            f.write(b"\0" * (offsets_at - asns_at - asns.nbytes))
+            f.write(offsets.tobytes())
+            f.write(neighbors.tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def open_mmap(cls, path: str) -> "CsrAsGraph":
+        """
+        Open a graph written by save_mmap without reading it: the arrays are
+        read-only numpy.memmap views, so every process opening the same file
+        shares a single copy through the OS page cache.
+        """
+        num_nodes, num_neighbors, _ = read_mmap_header(path)
+        asns_at, offsets_at, neighbors_at = _mmap_layout(num_nodes, num_neighbors)
+        asns = np.memmap(path, dtype="<u4", mode="r", offset=asns_at, shape=(num_nodes,))
+        offsets = np.memmap(path, dtype="<i8", mode="r", offset=offsets_at, shape=(num_nodes + 1,))
+        neighbors = np.memmap(path, dtype="<i4", mode="r", offset=neighbors_at, shape=(num_neighbors,))
+        return cls(asns, offsets, neighbors)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.asns)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.neighbors) // 2
+
+    def node_id(self, asn: Union[int, str]) -> int:
+        """Return the node id of an ASN, or -1 if the ASN is not in the graph."""
+        asn = int(asn)
+        if asn < 0 or asn > 0xFFFFFFFF:
+            return -1
+        i = int(np.searchsorted(self.asns, asn))
+        if i < len(self.asns) and int(self.asns[i]) == asn:
+            return i
+        return -1
+
+    def has_asn(self, asn: Union[int, str]) -> bool:
+        return self.node_id(asn) >= 0
+
+    def degrees(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def degree(self, asn: Union[int, str]) -> int:
+        i = self.node_id(asn)
+        if i < 0:
+            return 0
+        return int(self.offsets[i + 1] - self.offsets[i])
+
+    def neighbor_ids(self, i: int) -> np.ndarray:
+        return self.neighbors[self.offsets[i]:self.offsets[i + 1]]
+
+    def neighbors_of(self, asn: Union[int, str]) -> List[str]:
+        i = self.node_id(asn)
+        if i < 0:
+            return []
+        return [str(a) for a in self.asns[self.neighbor_ids(i)]]
+
+    def expand(self, frontier: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (parents, children) for all the edges leaving the frontier nodes,
+        gathered with a single vectorized slice of the neighbors array.
+        """
+        starts = self.offsets[frontier]
+        counts = self.offsets[frontier + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            empty = np.empty(0, dtype=np.int32)
+            return empty, empty
+        shift = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        children = self.neighbors[np.arange(total, dtype=np.int64) + shift]
+        parents = np.repeat(frontier, counts)
+        return parents, children
+
+    def shortest_path(self, source: Union[int, str], target: Union[int, str],
+                      max_hops: Optional[int] = None) -> Optional[List[str]]:
+        """Return the shortest path as a list of ASN strings, or None."""
+        return bidirectional_shortest_path(self, source, target, max_hops)[0]
+
+    def shortest_path_length(self, source: Union[int, str], target: Union[int, str],
+                             max_hops: Optional[int] = None) -> int:
+        """Return the hop count of the shortest path, or -1 if there is none."""
+        return bidirectional_shortest_path(self, source, target, max_hops)[1]
+
+
+def _frontier_cost(graph: CsrAsGraph, frontier: np.ndarray) -> int:
+    return int((graph.offsets[frontier + 1] - graph.offsets[frontier]).sum())
+
+def bidirectional_shortest_path(graph: CsrAsGraph, source: Union[int, str], target: Union[int, str],
+                                max_hops: Optional[int] = None) -> Tuple[Optional[List[str]], int]:
+    """
+    Bidirectional BFS between two ASNs.
+    Each step expands one full level of whichever side has the cheaper frontier
+    (fewer outgoing edges) and the search stops at the first level where the two
+    sides meet, or once `max_hops` levels have been explored without meeting.
+    Returns (path, length) with the path as a list of ASN strings, or (None, -1).
+    """
+    s, t = graph.node_id(source), graph.node_id(target)
+    if s < 0 or t < 0:
+        return None, -1
+    if s == t:
+        return [str(graph.asns[s])], 0
+    parent_f = np.full(graph.num_nodes, -1, dtype=np.int32)
+    parent_b = np.full(graph.num_nodes, -1, dtype=np.int32)
+    parent_f[s], parent_b[t] = s, t
+    frontier_f = np.array([s], dtype=np.int32)
+    frontier_b = np.array([t], dtype=np.int32)
+    hops = 0
+    while len(frontier_f) and len(frontier_b):
+        if max_hops is not None and hops >= max_hops:
+            break
+        forward = _frontier_cost(graph, frontier_f) <= _frontier_cost(graph, frontier_b)
+        frontier, parent, other = (frontier_f, parent_f, parent_b) if forward else (frontier_b, parent_b, parent_f)
+        parents, children = graph.expand(frontier)
+        new = parent[children] < 0
+        children, first = np.unique(children[new], return_index=True)
+        parent[children] = parents[new][first]
+        hops += 1
+        meet = children[other[children] >= 0]
+        if len(meet):
+            m = int(meet[0])
+            path = [m]
+            while path[-1] != s:
+                path.append(int(parent_f[path[-1]]))
+            path.reverse()
+            while path[-1] != t:
+                path.append(int(parent_b[path[-1]]))
+            return [str(a) for a in graph.asns[path]], len(path) - 1
+        if forward:
+            frontier_f = children
+        else:
+            frontier_b = children
+    return None, -1
+
+def bfs_distances(graph: CsrAsGraph, source_id: int, max_depth: int) -> np.ndarray:
+    """Hop distance of every node from `source_id`, -1 for nodes further than `max_depth`."""
+    dist = np.full(graph.num_nodes, -1, dtype=np.int32)
+    dist[source_id] = 0
+    frontier = np.array([source_id], dtype=np.int32)
+    for depth in range(1, max_depth + 1):
+        _, children = graph.expand(frontier)
+        children = np.unique(children[dist[children] < 0])
+        if not len(children):
+            break
+        dist[children] = depth
+        frontier = children
+    return dist
+
+def iter_paths_with_exact_length(graph: CsrAsGraph, source: Union[int, str], target: Union[int, str], length: int,
+                                 max_results: Optional[int] = None,
+                                 timeout: Optional[float] = None) -> Iterator[List[str]]:
+    """
+    Stream the simple paths from source to target with exactly `length` edges.
+    A BFS from the target bounds the search: a neighbour is only followed if
+    the target is still reachable from it within the remaining hops, so the
+    DFS never enters branches that cannot end at the target in time.
+    Stops after `max_results` paths or `timeout` seconds, whichever comes first.
+    """
+    s, t = graph.node_id(source), graph.node_id(target)
+    if s < 0 or t < 0 or length < 1 or s == t:
+        return
+    dist = bfs_distances(graph, t, length)
+    if dist[s] < 0:
+        return
+    deadline = None if timeout is None else time.monotonic() + timeout
+    on_path = np.zeros(graph.num_nodes, dtype=bool)
+
+    def candidates(u: int, remaining: int) -> List[int]:
+        # Neighbours from which the target is reachable in `remaining - 1` hops
+        nb = graph.neighbor_ids(u)
+        d = dist[nb]
+        keep = (d >= 0) & (d <= remaining - 1) & ~on_path[nb]
+        if remaining > 1:
+            # The target may only be the last hop
+            keep &= nb != t
+        return nb[keep].tolist()
+
+    found = 0
+    path = [s]
+    on_path[s] = True
+    stack = [iter(candidates(s, length))]
+    steps = 0
+    while stack:
+        steps += 1
+        if deadline is not None and steps % 1024 == 0 and time.monotonic() > deadline:
+            return
+        child = next(stack[-1], None)
+        if child is None:
+            stack.pop()
+            on_path[path.pop()] = False
+            continue
+        if child == t:
+            yield [str(a) for a in graph.asns[path + [t]]]
+            found += 1
+            if max_results is not None and found >= max_results:
+                return
+            continue
+        path.append(child)
+        on_path[child] = True
+        stack.append(iter(candidates(child, length - len(path) + 1)))
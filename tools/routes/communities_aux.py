@@ -0,0 +1,199 @@
+import os
+import numpy as np
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from tools.routes.sketch_aux import HyperLogLogBank, hash64
+
+# Streaming community -> prefixes aggregation with bounded memory.
+# Communities are interned to dense ids and every observation is buffered as
+# (community id, prefix value) in flat integer arrays, then folded in batches:
+#  - exact mode: prefixes are interned too, and each batch becomes a sorted,
+#    deduplicated run of uint64 `community_id << 32 | prefix_id` pairs. Runs
+#    are kept in memory (compacted into one) or, with `spill_dir`, written to
+#    .npy files and memory-mapped back on query.
+#  - sketch mode: no per-prefix state at all; every community gets a
+#    HyperLogLog counter of its distinct prefixes.
+# Announcement counts per community are exact in both modes.
+class CommunityAggregator(Mapping):
+    def __init__(self, exact: bool = True, spill_dir: Optional[str] = None,
+                 max_buffered: int = 2_000_000, hll_precision: int = 10):
+        self.exact = exact
+        self.spill_dir = spill_dir
+        self.max_buffered = max_buffered
+        self.community_ids: Dict[str, int] = {}
+        self.communities: List[str] = []
+        self.prefix_ids: Dict[str, int] = {}
+        self.prefixes: List[str] = []
+        self.announcements = np.zeros(0, dtype=np.int64)
+        self.hll = None if exact else HyperLogLogBank(hll_precision)
+        self._runs: List = []
+        self._keys = array("I")
+        self._values = array("Q")
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def empty(self) -> "CommunityAggregator":
+        return type(self)(self.exact, self.spill_dir, self.max_buffered,
+                          self.hll.p if self.hll is not None else 10)
+
+    def _community_id(self, community: str) -> int:
+        cid = self.community_ids.get(community)
+        if cid is None:
+            cid = self.community_ids[community] = len(self.communities)
+            self.communities.append(community)
+        return cid
+
+    def _prefix_value(self, prefix: str) -> int:
+        if not self.exact:
+            return hash64(prefix)
+        pid = self.prefix_ids.get(prefix)
+        if pid is None:
+            pid = self.prefix_ids[prefix] = len(self.prefixes)
+            self.prefixes.append(prefix)
+        return pid
+
+    def add(self, prefix: str, communities: Iterable[str]):
+        """Record one RIB entry / announcement of `prefix` tagged with `communities`."""
+        value = None
+        for community in communities:
+            if value is None:
+                value = self._prefix_value(prefix)
+            self._keys.append(self._community_id(community))
+            self._values.append(value)
+        if len(self._keys) >= self.max_buffered:
+            self.flush()
+
+    def flush(self):
+        """Fold the buffered observations into the runs / sketches."""
+        if not len(self._keys):
+            return
+        keys = np.frombuffer(self._keys, dtype=np.uint32).astype(np.int64)
+        values = np.frombuffer(self._values, dtype=np.uint64)
+        counts = np.bincount(keys, minlength=len(self.communities))
+        counts[:len(self.announcements)] += self.announcements
+        self.announcements = counts
+        if self.exact:
+            self._add_run(np.unique((keys.astype(np.uint64) << np.uint64(32)) | values))
+        else:
+            self.hll.add(keys, values)
+        self._keys = array("I")
+        self._values = array("Q")
+
+    def _add_run(self, run: np.ndarray):
+        if self.spill_dir:
+            path = os.path.join(self.spill_dir, f"run-{os.getpid()}-{id(self):x}-{len(self._runs)}.npy")
+            np.save(path, run)
+            self._runs.append(path)
+        elif self._runs:
+            self._runs[0] = np.union1d(self._runs[0], run)
+        else:
+            self._runs.append(run)
+
+    def _iter_runs(self) -> Iterator[np.ndarray]:
+        for run in self._runs:
+            yield np.load(run, mmap_mode="r") if isinstance(run, str) else run
+
+    def _pairs(self, lo: int, hi: int) -> np.ndarray:
+        """Distinct pairs of the communities with ids in [lo, hi)."""
+        lo_key, hi_key = np.uint64(lo << 32), np.uint64(hi << 32)
+        parts = []
+        for run in self._iter_runs():
+            parts.append(np.asarray(run[np.searchsorted(run, lo_key):np.searchsorted(run, hi_key)]))
+        return np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.uint64)
+
+    def prefix_counts(self, block: int = 4096) -> np.ndarray:
+        """(Estimated, in sketch mode) number of distinct prefixes of every community, by id."""
+        self.flush()
+        if not self.exact:
+            counts = np.zeros(len(self.communities))
+            counts[:len(self.hll)] = self.hll.estimate()[:len(self.communities)]
+            return counts
+        counts = np.zeros(len(self.communities), dtype=np.int64)
+        # Walk the runs one block of communities at a time to bound memory
+        for lo in range(0, len(self.communities), block):
+            hi = min(lo + block, len(self.communities))
+            keys = (self._pairs(lo, hi) >> np.uint64(32)).astype(np.int64) - lo
+            counts[lo:hi] = np.bincount(keys, minlength=hi - lo)
+        return counts
+
+    def prefix_count(self, community: str) -> float:
+        self.flush()
+        cid = self.community_ids.get(community)
+        if cid is None:
+            return 0
+        if not self.exact:
+            return float(self.hll.estimate([cid])[0]) if cid < len(self.hll) else 0.0
+        return len(self._pairs(cid, cid + 1))
+
+    def announcement_count(self, community: str) -> int:
+        self.flush()
+        cid = self.community_ids.get(community)
+        return 0 if cid is None else int(self.announcements[cid])
+
+    def top_k(self, k: int = 10, by: str = "prefixes") -> List[Tuple[str, float]]:
+        """The k communities with the most distinct prefixes (`by="prefixes"`) or announcements."""
+        if by == "prefixes":
+            counts = self.prefix_counts()
+        elif by == "announcements":
+            self.flush()
+            counts = self.announcements
+        else:
+            raise ValueError(f"Unknown ranking: {by}")
+        k = min(k, len(counts))
+        if k <= 0:
+            return []
+        top = np.argpartition(-counts, k - 1)[:k]
+        top = top[np.argsort(-counts[top], kind="stable")]
+        return [(self.communities[i], counts[i].item()) for i in top]
+
+    def merge(self, other: "CommunityAggregator"):
+        """Fold another aggregator (e.g. another collector's) into this one."""
+        if other.exact != self.exact:
+            raise ValueError("Cannot merge exact and sketch community aggregators")
+        self.flush()
+        other.flush()
+        community_map = np.fromiter((self._community_id(c) for c in other.communities),
+                                    dtype=np.int64, count=len(other.communities))
+        counts = np.zeros(len(self.communities), dtype=np.int64)
+        counts[:len(self.announcements)] = self.announcements
+        np.add.at(counts, community_map[:len(other.announcements)], other.announcements)
+        self.announcements = counts
+        if not self.exact:
+            self.hll.merge(other.hll, community_map[:len(other.hll)])
+            return self
+        prefix_map = np.fromiter((self._prefix_value(p) for p in other.prefixes),
+                                 dtype=np.uint64, count=len(other.prefixes))
+        for run in other._iter_runs():
+            keys = community_map[(run >> np.uint64(32)).astype(np.int64)].astype(np.uint64)
+            values = prefix_map[(run & np.uint64(0xFFFFFFFF)).astype(np.int64)]
+            self._add_run(np.unique((keys << np.uint64(32)) | values))
+        return self
+
+    def close(self):
+        """Delete the spilled runs."""
+        for run in self._runs:
+            if isinstance(run, str) and os.path.exists(run):
+                os.remove(run)
+        self._runs = []
+
+    # Mapping interface: community -> set of prefixes (exact mode only), so the
+    # aggregator is a drop-in for the old community -> set(prefix) dict
+    def __getitem__(self, community: str) -> set:
+        if not self.exact:
+            raise TypeError("A sketch-mode CommunityAggregator keeps no prefix sets; use prefix_count()")
+        self.flush()
+        cid = self.community_ids.get(community)
+        if cid is None:
+            raise KeyError(community)
+        pairs = self._pairs(cid, cid + 1)
+        return {self.prefixes[i] for i in (pairs & np.uint64(0xFFFFFFFF)).astype(np.int64).tolist()}
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self.communities))
+
+    def __len__(self) -> int:
+        return len(self.communities)
+
+    def __contains__(self, community) -> bool:
+        return community in self.community_ids
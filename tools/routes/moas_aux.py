@@ -0,0 +1,89 @@
+import os
+import pickle
+from ipaddress import ip_network
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from tools.routes.prefix_trie_aux import PrefixTrie
+
+MOAS_INDEX_PATH = 'datasets/routes/moas_index.pkl'
+# RIB snapshot the MOAS index is built from unless another window is asked for
+MOAS_FROM_TIME = "2024-08-01 07:50:00"
+MOAS_UNTIL_TIME = "2024-08-01 08:10:00"
+
+def normalize_prefix(prefix: str) -> str:
+    return str(ip_network(str(prefix).strip(), strict=False))
+
+class MoasIndex:
+    """
+    Prefix -> origin-set index of one RIB snapshot, with the reverse
+    origin -> MOAS prefixes index, so MOAS questions are dict lookups.
+    """
+    def __init__(self, prefix_origin: Dict[str, Iterable[str]], snapshot: Optional[dict] = None):
+        self.snapshot = snapshot or {}
+        self.prefix_origin = {pfx: frozenset(str(o) for o in origins) for pfx, origins in prefix_origin.items()}
+        origin_moas = defaultdict(list)
+        for pfx, origins in self.prefix_origin.items():
+            if len(origins) > 1:
+                for origin in origins:
+                    origin_moas[origin].append(pfx)
+        self.origin_moas = dict(origin_moas)
+        self._trie = None
+
+    @property
+    def trie(self) -> PrefixTrie:
+        """Radix trie over the same prefixes, built on first use (covering / more-specific queries)."""
+        if self._trie is None:
+            trie = PrefixTrie()
+            for pfx, origins in self.prefix_origin.items():
+                trie.insert(pfx, origins)
+            self._trie = trie
+        return self._trie
+
+    def save(self, path: str = MOAS_INDEX_PATH):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({"snapshot": self.snapshot, "prefix_origin": self.prefix_origin}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = MOAS_INDEX_PATH) -> "MoasIndex":
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        return cls(data["prefix_origin"], data["snapshot"])
+
+    def origins(self, prefix: str) -> frozenset:
+        return self.prefix_origin.get(normalize_prefix(prefix), frozenset())
+
+    def is_moas(self, prefix: str) -> bool:
+        return len(self.origins(prefix)) > 1
+
+    def moas_prefixes(self) -> List[str]:
+        return [pfx for pfx, origins in self.prefix_origin.items() if len(origins) > 1]
+
+    def moas_prefixes_for_asn(self, asn: Union[int, str]) -> List[str]:
+        return list(self.origin_moas.get(str(asn), []))
+
+    def covering_prefixes(self, prefix: str) -> List[Tuple[str, frozenset]]:
+        """Announced prefixes covering `prefix` (itself included), least specific first."""
+        return self.trie.covering(prefix)
+
+    def sub_moas(self, prefix: str) -> List[Tuple[str, frozenset]]:
+        """
+        More-specifics of `prefix` announced by an origin that does not
+        originate `prefix` itself (sub-MOAS), with their origin sets.
+        """
+        origins = self.origins(prefix)
+        pfx = normalize_prefix(prefix)
+        return [(sub, sub_origins) for sub, sub_origins in self.trie.subtree(pfx)
+                if sub != pfx and not sub_origins <= origins]
+
+_MOAS_INDEXES: Dict[str, MoasIndex] = {}
+
+def get_moas_index(index_path: str = MOAS_INDEX_PATH, reload: bool = False) -> MoasIndex:
+    """Return the shared MOAS index, loading it on first use (`reload=True` after a rebuild)."""
+    if reload or index_path not in _MOAS_INDEXES:
+        if not os.path.exists(index_path):
+            raise FileNotFoundError(f"MOAS index not found: {index_path} (build it with build_moas_index)")
+        _MOAS_INDEXES[index_path] = MoasIndex.load(index_path)
+    return _MOAS_INDEXES[index_path]
@@ -0,0 +1,71 @@
+import re
+import numpy as np
+from typing import Iterable, List, Union
+
+# Batched AS path normalization.
+# A batch of AS paths is parsed in one pass: the paths are joined into a
+# single string separated by AS0 (reserved, so it never forms an edge), any
+# token that is not a plain ASN (AS_SETs such as "{1,2}") is rewritten to -1
+# and the whole string is converted with one np.fromstring call. Prepends are
+# then collapsed and edges extracted with array operations only.
+
+PATH_BREAK = "0"
+_NON_ASN_CHAR = re.compile(r"[^\d\s]")
+_NON_ASN_TOKEN = re.compile(r"\S*[^\d\s]\S*")
+
+# Inclusive ranges of ASNs that never appear as real adjacencies (RFC 7607
+# AS0, RFC 6793 AS_TRANS, RFC 5398 documentation, RFC 6996 private use,
+# IANA reserved and the last 16/32-bit ASNs)
+RESERVED_ASN_RANGES = np.array([
+    (0, 0),
+    (23456, 23456),
+    (64496, 131071),
+    (4200000000, 4294967295),
+], dtype=np.int64)
+
+def is_public_asn(asns: np.ndarray) -> np.ndarray:
+    """Mask of the ASNs that are neither private nor reserved (parse failures, -1, are not public)."""
+    asns = np.asarray(asns, dtype=np.int64)
+    public = (asns > 0) & (asns <= 0xFFFFFFFF)
+    for lo, hi in RESERVED_ASN_RANGES:
+        public &= (asns < lo) | (asns > hi)
+    return public
+
+def parse_path_tokens(tokens: Union[str, List[str]]) -> np.ndarray:
+    """ASN tokens (or one string of them) -> int64 array, with -1 for every AS_SET / non-ASN token."""
+    text = tokens if isinstance(tokens, str) else " ".join(tokens)
+    if _NON_ASN_CHAR.search(text):
+        text = _NON_ASN_TOKEN.sub("-1", text)
+    return np.fromstring(text, dtype=np.int64, sep=" ")
+
+def collapse_prepends(asns: np.ndarray) -> np.ndarray:
+    """Drop consecutive repeats of the same ASN."""
+    if not len(asns):
+        return asns
+    keep = np.empty(len(asns), dtype=bool)
+    keep[0] = True
+    np.not_equal(asns[1:], asns[:-1], out=keep[1:])
+    return asns[keep]
+
+def edge_keys(asns: np.ndarray) -> np.ndarray:
+    """
+    Sorted, deduplicated undirected edges of a parsed batch, packed as
+    uint64 `low << 32 | high`. Edges touching an AS_SET or a private/reserved
+    ASN (including the AS0 path breaks) are dropped.
+    """
+    asns = collapse_prepends(asns)
+    public = is_public_asn(asns)
+    valid = public[:-1] & public[1:]
+    a = asns[:-1][valid].astype(np.uint64)
+    b = asns[1:][valid].astype(np.uint64)
+    return np.unique((np.minimum(a, b) << np.uint64(32)) | np.maximum(a, b))
+
+def edge_keys_from_paths(paths: Iterable[Union[str, List[str]]]) -> np.ndarray:
+    """edge_keys of AS path strings or ASN token lists."""
+    joined = f" {PATH_BREAK} ".join(p if isinstance(p, str) else " ".join(p) for p in paths)
+    return edge_keys(parse_path_tokens(joined))
+
+def edge_array(keys: np.ndarray) -> np.ndarray:
+    """Packed edge keys -> (m, 2) uint32 ASN pairs (as taken by CsrAsGraph.from_edge_array)."""
+    keys = np.asarray(keys, dtype=np.uint64)
+    return np.stack([keys >> np.uint64(32), keys & np.uint64(0xFFFFFFFF)], axis=1).astype(np.uint32)
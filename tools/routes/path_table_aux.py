@@ -0,0 +1,122 @@
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from tools.routes.route_index_aux import iter_distinct_routes
+
+PATH_TABLE_PATH = 'tools/routes/routes_table.npz'
+
+# Deduplicated, integer-encoded AS path storage.
+# Every distinct path is stored once: path i is
+# `asns[path_offsets[i]:path_offsets[i + 1]]` (uint32) and was observed
+# `seen[i]` times. The per-ASN posting lists map ASN `post_asns[k]` (sorted)
+# to the ids of the paths that contain it:
+# `post_ids[post_offsets[k]:post_offsets[k + 1]]`.
+class PathTable:
+    def __init__(self, asns: np.ndarray, path_offsets: np.ndarray, seen: np.ndarray,
+                 post_asns: np.ndarray, post_offsets: np.ndarray, post_ids: np.ndarray):
+        self.asns = asns
+        self.path_offsets = path_offsets
+        self.seen = seen
+        self.post_asns = post_asns
+        self.post_offsets = post_offsets
+        self.post_ids = post_ids
+
+    @property
+    def num_paths(self) -> int:
+        return len(self.path_offsets) - 1
+
+    def save(self, path: str = PATH_TABLE_PATH):
+        np.savez(path, asns=self.asns, path_offsets=self.path_offsets, seen=self.seen,
+                 post_asns=self.post_asns, post_offsets=self.post_offsets, post_ids=self.post_ids)
+
+    @classmethod
+    def load(cls, path: str = PATH_TABLE_PATH) -> "PathTable":
+        with np.load(path) as data:
+            return cls(data["asns"], data["path_offsets"], data["seen"],
+                       data["post_asns"], data["post_offsets"], data["post_ids"])
+
+    def path(self, path_id: int) -> List[str]:
+        return [str(a) for a in self.asns[self.path_offsets[path_id]:self.path_offsets[path_id + 1]]]
+
+    def path_ids_for_asn(self, asn: Union[int, str]) -> np.ndarray:
+        asn = int(asn)
+        k = int(np.searchsorted(self.post_asns, asn))
+        if k == len(self.post_asns) or int(self.post_asns[k]) != asn:
+            return np.empty(0, dtype=np.uint32)
+        return self.post_ids[self.post_offsets[k]:self.post_offsets[k + 1]]
+
+    def paths_for_asn(self, asn: Union[int, str]) -> List[List[str]]:
+        return [self.path(i) for i in self.path_ids_for_asn(asn).tolist()]
+
+    def adjacent_path_ids(self, x: Union[int, str], y: Union[int, str]) -> np.ndarray:
+        """Ids (ascending) of the paths on which x and y appear next to each other."""
+        x, y = int(x), int(y)
+        candidates = np.intersect1d(self.path_ids_for_asn(x), self.path_ids_for_asn(y)).astype(np.int64)
+        if not len(candidates):
+            return candidates
+        # Gather the ASNs of all candidate paths in one vectorized slice
+        starts = self.path_offsets[candidates]
+        counts = self.path_offsets[candidates + 1] - starts
+        shift = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        hops = self.asns[np.arange(int(counts.sum()), dtype=np.int64) + shift]
+        owner = np.repeat(candidates, counts)
+        same_path = owner[:-1] == owner[1:]
+        a, b = hops[:-1], hops[1:]
+        match = same_path & (((a == x) & (b == y)) | ((a == y) & (b == x)))
+        return np.unique(owner[:-1][match])
+
+    def iter_adjacent_routes(self, x: Union[int, str], y: Union[int, str]):
+        """Yield (route, seen) for every distinct path where x and y are adjacent."""
+        for i in self.adjacent_path_ids(x, y).tolist():
+            yield self.path(i), int(self.seen[i])
+
+class PathTableBuilder:
+    """Interns AS paths as they stream in and builds a PathTable."""
+    def __init__(self):
+        self._ids: Dict[Tuple[int, ...], int] = {}
+        self._seen: List[int] = []
+
+    def add(self, path: Union[str, Iterable[Union[int, str]]], seen: int = 1) -> Optional[int]:
+        """Intern a path (ASN list or AS path string); returns its id, or None for paths with AS_SETs."""
+        hops = path.split() if isinstance(path, str) else [str(a) for a in path]
+        if not hops or not all(h.isdigit() for h in hops):
+            return None
+        key = tuple(int(h) for h in hops)
+        path_id = self._ids.get(key)
+        if path_id is None:
+            path_id = self._ids[key] = len(self._seen)
+            self._seen.append(0)
+        self._seen[path_id] += seen
+        return path_id
+
+    def merge(self, other: "PathTableBuilder"):
+        """Fold the paths interned by another builder (e.g. another collector's) into this one."""
+        for key, other_id in other._ids.items():
+            path_id = self._ids.get(key)
+            if path_id is None:
+                path_id = self._ids[key] = len(self._seen)
+                self._seen.append(0)
+            self._seen[path_id] += other._seen[other_id]
+        return self
+
+    def build(self) -> PathTable:
+        paths = list(self._ids)
+        lengths = np.fromiter((len(p) for p in paths), dtype=np.int64, count=len(paths))
+        path_offsets = np.zeros(len(paths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=path_offsets[1:])
+        asns = np.fromiter((a for p in paths for a in p), dtype=np.uint32, count=int(path_offsets[-1]))
+        # Posting lists over the distinct (asn, path id) pairs
+        owner = np.repeat(np.arange(len(paths), dtype=np.uint64), lengths)
+        pairs = np.unique((asns.astype(np.uint64) << np.uint64(32)) | owner)
+        pair_asns = (pairs >> np.uint64(32)).astype(np.uint32)
+        post_ids = (pairs & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+        post_asns, first = np.unique(pair_asns, return_index=True)
+        post_offsets = np.append(first, len(pair_asns)).astype(np.int64)
+        seen = np.asarray(self._seen, dtype=np.uint32)
+        return PathTable(asns, path_offsets, seen, post_asns, post_offsets, post_ids)
+
+def path_table_from_routes_by_asn(routes_by_asn: Dict[str, List[List[str]]]) -> PathTable:
+    """Build a PathTable from the output of group_routes_by_asn (or the per-ASN JSON files)."""
+    builder = PathTableBuilder()
+    for route, seen in iter_distinct_routes(routes_by_asn):
+        builder.add(route, seen)
+    return builder.build()
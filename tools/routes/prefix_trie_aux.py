@@ -0,0 +1,153 @@
+from ipaddress import ip_network, IPv4Network, IPv6Network
+from typing import Any, Iterator, List, Optional, Tuple
+
+WIDTH = {4: 32, 6: 128}
+_NETWORK = {4: IPv4Network, 6: IPv6Network}
+
+def parse_prefix(prefix) -> Tuple[int, int, int]:
+    """Return (version, network as int, prefix length) for a prefix or an IP address."""
+    net = prefix if isinstance(prefix, (IPv4Network, IPv6Network)) else ip_network(str(prefix).strip(), strict=False)
+    return net.version, int(net.network_address), net.prefixlen
+
+def format_prefix(version: int, key: int, length: int) -> str:
+    return str(_NETWORK[version]((key, length)))
+
+class _Node:
+    __slots__ = ("key", "length", "children", "value", "has_value")
+
+    def __init__(self, key: int, length: int):
+        self.key = key
+        self.length = length
+        self.children = [None, None]
+        self.value = None
+        self.has_value = False
+
+# Path-compressed binary (Patricia) trie over IPv4 and IPv6 prefixes.
+# Each stored prefix maps to a value (e.g. a set of origin ASNs); internal
+# branching nodes carry no value. Prefixes are handled as (int, length)
+# pairs, so lookups only do integer bit arithmetic.
+class PrefixTrie:
+    def __init__(self):
+        self._roots = {4: _Node(0, 0), 6: _Node(0, 0)}
+        self._size = 0
+
+    @staticmethod
+    def _bit(key: int, pos: int, width: int) -> int:
+        return (key >> (width - 1 - pos)) & 1
+
+    @staticmethod
+    def _common_length(a: int, b: int, limit: int, width: int) -> int:
+        diff = a ^ b
+        if diff == 0:
+            return limit
+        return min(limit, width - diff.bit_length())
+
+    def _find_or_create(self, version: int, key: int, length: int) -> _Node:
+        width = WIDTH[version]
+        node = self._roots[version]
+        while True:
+            if node.length == length:
+                return node
+            b = self._bit(key, node.length, width)
+            child = node.children[b]
+            if child is None:
+                child = node.children[b] = _Node(key, length)
+                return child
+            common = self._common_length(child.key, key, min(child.length, length), width)
+            if common == child.length:
+                node = child
+                continue
+            new = _Node(key, length)
+            if common == length:
+                # The new prefix sits between node and child
+                new.children[self._bit(child.key, length, width)] = child
+                node.children[b] = new
+                return new
+            # Branch off a value-less glue node at the first differing bit
+            mask = ((1 << common) - 1) << (width - common)
+            glue = _Node(key & mask, common)
+            glue.children[self._bit(key, common, width)] = new
+            glue.children[self._bit(child.key, common, width)] = child
+            node.children[b] = glue
+            return new
+
+    def _path(self, version: int, key: int, length: int) -> Iterator[_Node]:
+        """Yield the nodes whose prefix covers (key, length), least specific first."""
+        width = WIDTH[version]
+        node = self._roots[version]
+        while node is not None and node.length <= length:
+            if self._common_length(node.key, key, node.length, width) < node.length:
+                return
+            yield node
+            if node.length == length:
+                return
+            node = node.children[self._bit(key, node.length, width)]
+
+    def insert(self, prefix, value: Any):
+        node = self._find_or_create(*parse_prefix(prefix))
+        if not node.has_value:
+            node.has_value = True
+            self._size += 1
+        node.value = value
+
+    def setdefault(self, prefix, default: Any) -> Any:
+        node = self._find_or_create(*parse_prefix(prefix))
+        if not node.has_value:
+            node.has_value = True
+            node.value = default
+            self._size += 1
+        return node.value
+
+    def add(self, prefix, item: Any):
+        """Add `item` to the set stored at `prefix` (e.g. an origin ASN)."""
+        self.setdefault(prefix, set()).add(item)
+
+    def get(self, prefix, default: Any = None) -> Any:
+        version, key, length = parse_prefix(prefix)
+        for node in self._path(version, key, length):
+            if node.length == length and node.has_value:
+                return node.value
+        return default
+
+    def __contains__(self, prefix) -> bool:
+        sentinel = object()
+        return self.get(prefix, sentinel) is not sentinel
+
+    def __len__(self) -> int:
+        return self._size
+
+    def covering(self, prefix) -> List[Tuple[str, Any]]:
+        """All stored prefixes that cover `prefix` (itself included), least specific first."""
+        version, key, length = parse_prefix(prefix)
+        return [(format_prefix(version, n.key, n.length), n.value)
+                for n in self._path(version, key, length) if n.has_value]
+
+    def longest_match(self, prefix) -> Optional[Tuple[str, Any]]:
+        """Most specific stored prefix covering `prefix` (or an IP address), or None."""
+        matches = self.covering(prefix)
+        return matches[-1] if matches else None
+
+    def subtree(self, prefix) -> Iterator[Tuple[str, Any]]:
+        """Yield `prefix` (if stored) and all its stored more-specifics."""
+        version, key, length = parse_prefix(prefix)
+        width = WIDTH[version]
+        node = self._roots[version]
+        while node is not None and node.length < length:
+            if self._common_length(node.key, key, node.length, width) < node.length:
+                return
+            node = node.children[self._bit(key, node.length, width)]
+        if node is None or self._common_length(node.key, key, length, width) < length:
+            return
+        yield from self._walk(version, node)
+
+    def _walk(self, version: int, node: _Node) -> Iterator[Tuple[str, Any]]:
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            if n.has_value:
+                yield format_prefix(version, n.key, n.length), n.value
+            stack.extend(c for c in reversed(n.children) if c is not None)
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        for version in (4, 6):
+            yield from self._walk(version, self._roots[version])
@@ -0,0 +1,138 @@
+import os
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+ROUTE_INDEX_PATH = 'tools/routes/routes.sqlite'
+
+# One row per distinct route, plus a posting list of route ids for every
+# adjacent ASN pair (stored with a < b, since adjacency is undirected).
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS routes (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    seen INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS adjacency (
+    a INTEGER NOT NULL,
+    b INTEGER NOT NULL,
+    route_id INTEGER NOT NULL,
+    PRIMARY KEY (a, b, route_id)
+) WITHOUT ROWID;
+'''
+
+def iter_distinct_routes(routes_by_asn: Dict[str, List[List[str]]]) -> Iterator[Tuple[List[str], int]]:
+    """
+    Recover every distinct route and the number of times it was observed from
+    the output of group_routes_by_asn (where each route sits in the bucket of
+    every ASN on it, once per occurrence of that ASN).
+    """
+    counts = Counter()
+    for asn, routes in routes_by_asn.items():
+        for route in routes:
+            if str(route[0]) == str(asn):
+                counts[tuple(str(a) for a in route)] += 1
+    for route, n in counts.items():
+        yield list(route), max(1, n // route.count(route[0]))
+
+def _adjacent_pairs(route: List[str]) -> set:
+    pairs = set()
+    for a, b in zip(route, route[1:]):
+        if a != b and a.isdigit() and b.isdigit():
+            a, b = int(a), int(b)
+            pairs.add((a, b) if a < b else (b, a))
+    return pairs
+
+def build_route_index(routes: Iterable[Tuple[List[str], int]], db_path: str = ROUTE_INDEX_PATH,
+                      batch_size: int = 50_000):
+    """
+    Write (route, seen) pairs - e.g. iter_distinct_routes(group_routes_by_asn(...)) -
+    into a fresh SQLite route index at `db_path`.
+    """
+    tmp_path = f"{db_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executescript(SCHEMA)
+    route_rows, adjacency_rows = [], []
+
+    def flush():
+        conn.executemany("INSERT INTO routes (id, path, seen) VALUES (?, ?, ?)", route_rows)
+        conn.executemany("INSERT OR IGNORE INTO adjacency (a, b, route_id) VALUES (?, ?, ?)", adjacency_rows)
+        route_rows.clear()
+        adjacency_rows.clear()
+
+    seen_paths, extra_seen = {}, Counter()
+    for route, seen in routes:
+        key = " ".join(str(a) for a in route)
+        if key in seen_paths:
+            # Duplicate input route: only bump its count
+            extra_seen[seen_paths[key]] += seen
+            continue
+        route_id = len(seen_paths)
+        seen_paths[key] = route_id
+        route_rows.append((route_id, key, seen))
+        adjacency_rows.extend((a, b, route_id) for a, b in _adjacent_pairs(key.split()))
+        if len(route_rows) >= batch_size:
+            flush()
+    flush()
+    conn.executemany("UPDATE routes SET seen = seen + ? WHERE id = ?",
+                     [(n, route_id) for route_id, n in extra_seen.items()])
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, db_path)
+
+def build_route_index_from_dir(base_dir: str = "tools/routes/routes", db_path: str = ROUTE_INDEX_PATH):
+    """Build the route index from the legacy one-JSON-file-per-ASN routes directory."""
+    routes_by_asn = {}
+    for path in Path(base_dir).glob("*.json"):
+        routes_by_asn[path.stem] = json.loads(path.read_text(encoding="utf-8"))
+    build_route_index(iter_distinct_routes(routes_by_asn), db_path)
+
+class RouteIndex:
+    """Read-only view of a route index built by build_route_index."""
+    def __init__(self, db_path: str = ROUTE_INDEX_PATH):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def iter_adjacent_routes(self, x: Union[int, str], y: Union[int, str]) -> Iterator[Tuple[List[str], int]]:
+        """Yield (route, seen) for every distinct route where x and y are adjacent."""
+        a, b = int(x), int(y)
+        if a > b:
+            a, b = b, a
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT r.path, r.seen FROM adjacency j JOIN routes r ON r.id = j.route_id "
+                "WHERE j.a = ? AND j.b = ? ORDER BY j.route_id",
+                (a, b),
+            )
+        # Fetch in chunks so that callers streaming the result (e.g. reservoir
+        # sampling) never hold the whole posting list in memory
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            for path, seen in rows:
+                yield path.split(), seen
+
+# db path -> ((mtime, size) of the file it was opened at, index)
+_ROUTE_INDEXES: Dict[str, Tuple[tuple, RouteIndex]] = {}
+
+def get_route_index(db_path: str = ROUTE_INDEX_PATH) -> Optional[RouteIndex]:
+    """Return a shared RouteIndex for `db_path` (reopened after a rebuild), or None if no index was built."""
+    try:
+        st = os.stat(db_path)
+    except FileNotFoundError:
+        return None
+    signature = (st.st_mtime_ns, st.st_size)
+    cached = _ROUTE_INDEXES.get(db_path)
+    if cached is None or cached[0] != signature:
+        cached = _ROUTE_INDEXES[db_path] = (signature, RouteIndex(db_path))
+    return cached[1]
@@ -1,29 +1,138 @@
+import os
 import json
+import pickle
+import hashlib
+import threading
 from random import Random
 from pathlib import Path
-from typing import Any, Union, List, Optional
-import networkx as nx 
+from typing import Any, Union, List, Optional, Iterator
+from tools.routes.as_graph_aux import (CsrAsGraph, read_mmap_header, bidirectional_shortest_path,
+                                       iter_paths_with_exact_length)
+from tools.routes.route_index_aux import ROUTE_INDEX_PATH, get_route_index
+from tools.routes.path_table_aux import PATH_TABLE_PATH, PathTable
+from tools.routes.moas_aux import MOAS_INDEX_PATH, get_moas_index
 
+AS_GRAPH_PATH = 'datasets/routes/as_graph.pkl'
+AS_GRAPH_CSR_PATH = 'datasets/routes/as_graph.npz'
+AS_GRAPH_MMAP_PATH = 'datasets/routes/as_graph.asg'
+
+def load_graph_from_pickle(pickle_filename):
+    """Load a NetworkX graph from a pickle file"""
+    with open(pickle_filename, 'rb') as f:
+        graph = pickle.load(f)
+    return graph
+
+def load_as_graph(path: str) -> CsrAsGraph:
+    """Load the AS graph as a CsrAsGraph, converting a legacy networkx pickle if needed."""
+    if path.endswith('.asg'):
+        return CsrAsGraph.open_mmap(path)
+    if path.endswith('.npz'):
+        return CsrAsGraph.load(path)
+    return CsrAsGraph.from_networkx(load_graph_from_pickle(path))
+
+class AsGraphStore:
+    """
+    Process-wide, lazily loaded AS graph shared by all the routes tools.
+    The graph is loaded on first use and reloaded only when the file on disk
+    changes: a cheap (mtime, size) check runs on every access, and when it
+    differs the file content hash decides whether a reload is really needed.
+    The first existing file out of `paths` is used, so the memory-mapped graph
+    is preferred over the .npz CSR graph and the networkx pickle, and a
+    preferred file that appears later is switched to.
+    """
+    def __init__(self, paths=(AS_GRAPH_MMAP_PATH, AS_GRAPH_CSR_PATH, AS_GRAPH_PATH)):
+        self.paths = paths
+        self.path = None
+        self._graph = None
+        self._signature = None
+        self._digest = None
+        self._lock = threading.Lock()
+
+    def _resolve_path(self):
+        # Looked up on every access, so a newly written preferred file (e.g. the
+        # .asg written by update_as_graph) replaces the one loaded before
+        return next((p for p in self.paths if os.path.exists(p)), self.paths[-1])
+
+    def _stat_signature(self):
+        path = self._resolve_path()
+        st = os.stat(path)
+        return (path, st.st_mtime_ns, st.st_size)
+
+    def _file_digest(self, path: str) -> str:
+        if path.endswith('.asg'):
+            # The memory-mapped format stores its payload hash in the header,
+            # which keeps opening it O(1)
+            return read_mmap_header(path)[2]
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _load(self, signature):
+        self.path = signature[0]
+        self._graph = load_as_graph(self.path)
+        self._signature = signature
+        self._digest = self._file_digest(self.path)
+
+    def get(self):
+        signature = self._stat_signature()
+        if self._graph is not None and signature == self._signature:
+            return self._graph
+        with self._lock:
+            if self._graph is None or signature[0] != self.path:
+                self._load(signature)
+            elif signature != self._signature:
+                # mtime/size changed - reload only if the content really did
+                if self._file_digest(self.path) == self._digest:
+                    self._signature = signature
+                else:
+                    self._load(signature)
+            return self._graph
+
+    def reload(self):
+        """Force a reload of the graph from disk."""
+        with self._lock:
+            self._load(self._stat_signature())
+            return self._graph
+
+# Shared by every routes tool call in this process
+as_graph_store = AsGraphStore()
+
+def get_as_graph() -> CsrAsGraph:
+    return as_graph_store.get()
+
+# Find the shortest path between two ASes given the AS graph
+def shortest_path(as1, as2, max_hops: Optional[int] = None):
+    """
+    Returns (path, path_len) for the shortest path between two ASNs, or (None, -1)
+    when there is no path (of at most `max_hops` hops, if given).
+    """
+    as_graph = get_as_graph()
+    return bidirectional_shortest_path(as_graph, _norm_asn(as1), _norm_asn(as2), max_hops)
 
 # Check if a certain path is the shortest path between two ASNs
 def is_shortest_path(source, target, path):
     """Check if a given path is the shortest path between source and target in graph G."""
-    as_graph = load_graph_from_pickle('datasets/routes/as_graph.pkl')
-    try:
-        shortest_length = nx.shortest_path_length(as_graph, source, target)
-        return len(path) - 1 == shortest_length
-    except nx.NetworkXNoPath:
+    # No need to search further than the candidate path itself: if nothing
+    # at most that long exists, the candidate cannot be the shortest path
+    path_len = len(path) - 1
+    _, shortest_length = shortest_path(source, target, max_hops=path_len)
+    if shortest_length < 0:
         return False
+    return path_len == shortest_length
 
-        # Find all paths with exact length in the AS graph
-def paths_with_exact_length(source, target, length):
+# Find all paths with exact length in the AS graph
+def paths_with_exact_length(source, target, length, max_results: Optional[int] = 1000,
+                            timeout: Optional[float] = 10.0):
     """
-    Returns all simple paths in an undirected graph G from source to target
-    that have exactly `length` edges.
+    Returns the simple paths in an undirected graph G from source to target
+    that have exactly `length` edges, capped at `max_results` paths and
+    `timeout` seconds of search.
     """
-    as_graph = load_graph_from_pickle('datasets/routes/as_graph.pkl')
-    all_paths = nx.all_simple_paths(as_graph, source, target, cutoff=length)
-    return [path for path in all_paths if len(path) - 1 == length]
+    as_graph = get_as_graph()
+    return list(iter_paths_with_exact_length(as_graph, _norm_asn(source), _norm_asn(target), int(length),
+                                             max_results=max_results, timeout=timeout))
 
 def as_degree_from_as_graph(asn):
     '''
@@ -31,8 +140,48 @@ def as_degree_from_as_graph(asn):
     Input: asn (int | str)
     Output: degree (int)
     '''
-    as_graph = load_graph_from_pickle('datasets/routes/as_graph.pkl')
-    return as_graph.degree(str(asn))
+    as_graph = get_as_graph()
+    return as_graph.degree(_norm_asn(asn))
+
+# table path -> ((mtime, size) of the file it was loaded from, table)
+_PATH_TABLES = {}
+
+def get_path_table(table_path: str = PATH_TABLE_PATH) -> Optional[PathTable]:
+    """Return the shared interned path table (reloaded after a rebuild), or None if it was not built."""
+    try:
+        st = os.stat(table_path)
+    except FileNotFoundError:
+        return None
+    signature = (st.st_mtime_ns, st.st_size)
+    cached = _PATH_TABLES.get(table_path)
+    if cached is None or cached[0] != signature:
+        cached = _PATH_TABLES[table_path] = (signature, PathTable.load(table_path))
+    return cached[1]
+
+def read_asn_routes(asn: Union[int, str], base_dir: str = "tools/routes/routes",
+                    table_path: Optional[str] = PATH_TABLE_PATH) -> List[List[str]]:
+    """Return the distinct routes that contain the ASN, from the path table if available."""
+    path_table = get_path_table(table_path) if table_path else None
+    if path_table is not None:
+        return path_table.paths_for_asn(_norm_asn(asn))
+    return read_asn_json(asn, base_dir)
+
+# MOAS lookups for the routes tools, answered from the precomputed MOAS index
+def moas_prefixes_for_asn(asn, index_path: str = MOAS_INDEX_PATH) -> List[str]:
+    return get_moas_index(index_path).moas_prefixes_for_asn(_norm_asn(asn))
+
+def check_if_prefix_is_moas_bgp_stream(prefix, index_path: str = MOAS_INDEX_PATH):
+    """(True if the prefix has more than one origin, its sorted origin ASNs)."""
+    origins = get_moas_index(index_path).origins(prefix)
+    return (len(origins) > 1, sorted(origins))
+
+def sub_moas_prefixes(prefix) -> List[List]:
+    """More-specifics of the prefix announced by other origins, as [prefix, origins] pairs."""
+    return [[sub, sorted(origins)] for sub, origins in get_moas_index().sub_moas(prefix)]
+
+def covering_prefixes(prefix) -> List[List]:
+    """Announced prefixes covering the prefix, least specific first, as [prefix, origins] pairs."""
+    return [[pfx, sorted(origins)] for pfx, origins in get_moas_index().covering_prefixes(prefix)]
 
 def read_asn_json(asn: Union[int, str], base_dir: str = "tools/routes/routes") -> Any:
     asn_str = str(asn).strip()
@@ -59,18 +208,32 @@ def _norm_asn(a: Union[int, str]) -> str:
         raise ValueError(f"ASN must be numeric (got {a!r}).")
     return s
 
-def find_routes_for_asns(x: Union[int, str],
+def iter_routes_for_asns(x: Union[int, str],
                          y: Union[int, str],
                          base_dir: str = "tools/routes/routes",
-                         unique: bool = True) -> List[list]:
+                         unique: bool = True,
+                         index_path: Optional[str] = ROUTE_INDEX_PATH,
+                         table_path: Optional[str] = PATH_TABLE_PATH) -> Iterator[List[str]]:
+    """Stream the routes where x and y are adjacent (see find_routes_for_asns)."""
     x_str, y_str = _norm_asn(x), _norm_asn(y)
+    # Prefer the indexed route stores (SQLite index, then the interned path
+    # table): an adjacency lookup instead of a file parse
+    store = get_route_index(index_path) if index_path else None
+    if store is None and table_path:
+        store = get_path_table(table_path)
+    if store is not None:
+        for route, seen in store.iter_adjacent_routes(x_str, y_str):
+            for _ in range(1 if unique else seen):
+                yield route
+        return
+
     path = Path(base_dir) / f"{x_str}.json"
 
     if not path.exists():
         raise FileNotFoundError(f"File not found: {path.resolve()}")
 
     routes = json.loads(path.read_text(encoding="utf-8"))
-    out, seen = [], set()
+    seen = set()
 
     for route in routes:
         route = [str(a) for a in route]
@@ -85,20 +248,32 @@ def find_routes_for_asns(x: Union[int, str],
                 key = tuple(route)
                 if key not in seen:
                     seen.add(key)
-                    out.append(route)
+                    yield route
             else:
-                out.append(route)
-    return out
+                yield route
+
+def find_routes_for_asns(x: Union[int, str],
+                         y: Union[int, str],
+                         base_dir: str = "tools/routes/routes",
+                         unique: bool = True,
+                         index_path: Optional[str] = ROUTE_INDEX_PATH,
+                         table_path: Optional[str] = PATH_TABLE_PATH) -> List[list]:
+    return list(iter_routes_for_asns(x, y, base_dir, unique, index_path, table_path))
 
 def choose_random_routes(asn1, asn2, m: int = 100, seed: Optional[int] = None) -> List[List[str]]:
-    adj = find_routes_for_asns(asn1, asn2)
+    """
+    Uniformly sample up to m routes where asn1 and asn2 are adjacent.
+    The candidate routes are scanned once with reservoir sampling, so only m
+    routes are kept in memory; the same seed always yields the same sample.
+    """
     rnd = Random(seed)
-    n = len(adj)
-    if n == 0:
-        return []
-    k = min(m, n)
-    if k == n:
-        out = list(adj)
-        rnd.shuffle(out)
-        return out
-    return rnd.sample(list(adj), k)
+    reservoir = []
+    for n, route in enumerate(iter_routes_for_asns(asn1, asn2)):
+        if n < m:
+            reservoir.append(route)
+        else:
+            j = rnd.randint(0, n)
+            if j < m:
+                reservoir[j] = route
+    rnd.shuffle(reservoir)
+    return reservoir
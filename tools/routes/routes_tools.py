@@ -8,7 +8,7 @@ def find_shortest_path(asn1, asn2):
     """
     Given two ASNs of ASes, return the shortest path between them.
     Input: ASN1 (int), ASN2(int)
-    Output: List of ASNs which describe the ASes in the shortest path between the ASes (list)
+    Output: List of ASNs which describe the ASes in the shortest path between the ASes (list) and its length in hops (int)
     """
     return shortest_path(str(asn1), str(asn2))
 
@@ -27,7 +27,7 @@ def is_the_shortest_path(asn1, asn2, path):
 @tool
 def paths_with_length(asn1, asn2, length):
     """
-    Given two ASes, find all the paths of a given length
+    Given two ASes, find all the paths of a given length (at most 1000 paths are returned)
     Input: ASN1 (int), ASN2(int)
     Output: List of ASNs which describe the ASes in the shortest path between the ASes (list of strings)
     """
@@ -49,7 +49,7 @@ def check_if_prefix_is_moas_bgpstream(prefix):
     """
     Given a prefix, check if it's a moas prefix
     Input: Prefix (string)
-    Output: True / False
+    Output: (True / False, list of the prefix's origin ASNs) tuple
     """
     return check_if_prefix_is_moas_bgp_stream(prefix)
 
@@ -0,0 +1,163 @@
+import json
+import time
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from tools.routes.prefix_trie_aux import PrefixTrie, parse_prefix
+
+VRP_PATH = 'tools/rpki/vrps.json'
+ROUTEVIEWS_RPKI_URL = "https://api.routeviews.org/rpki"
+
+VALID = "valid"
+INVALID = "invalid"
+NOT_FOUND = "not-found"
+
+def _parse_asn(asn) -> Optional[int]:
+    s = str(asn).strip()
+    if s.lower().startswith("as"):
+        s = s[2:]
+    return int(s) if s.isdigit() else None
+
+class RpkiValidator:
+    """
+    Local RPKI route origin validation (RFC 6811).
+    The VRPs (prefix, max length, ASN) are loaded into a prefix trie, so a
+    route is validated by walking the VRPs covering its prefix only.
+    """
+    def __init__(self):
+        self.trie = PrefixTrie()
+        self.num_vrps = 0
+
+    @classmethod
+    def from_vrp_file(cls, path: str = VRP_PATH) -> "RpkiValidator":
+        """
+        Load a VRP JSON export: routinator (`--format json`/`jsonext`) and
+        rpki-client both write {"roas": [{"asn", "prefix", "maxLength"}, ...]}.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        roas = data.get("roas", []) if isinstance(data, dict) else data
+        validator = cls()
+        for roa in roas:
+            max_length = roa.get("maxLength", roa.get("max_length", roa.get("maxlen")))
+            validator.add_vrp(roa["prefix"], roa["asn"], max_length)
+        return validator
+
+    def add_vrp(self, prefix: str, asn: Union[int, str], max_length: Optional[int] = None):
+        _, _, length = parse_prefix(prefix)
+        max_length = length if max_length is None else int(max_length)
+        self.trie.setdefault(prefix, set()).add((_parse_asn(asn), max_length))
+        self.num_vrps += 1
+
+    def validate(self, prefix: str, origin: Union[int, str]) -> str:
+        """Return "valid", "invalid" or "not-found" for an announcement of `prefix` by `origin`."""
+        _, _, length = parse_prefix(prefix)
+        covering = self.trie.covering(prefix)
+        if not covering:
+            return NOT_FOUND
+        origin = _parse_asn(origin)
+        for _, vrps in covering:
+            for asn, max_length in vrps:
+                # AS0 VRPs never validate anything (RFC 6483)
+                if asn and asn == origin and length <= max_length:
+                    return VALID
+        return INVALID
+
+    def validate_many(self, pairs: Iterable[Tuple[str, Union[int, str]]]) -> List[str]:
+        """Validate (prefix, origin) pairs in bulk; repeated pairs are validated once."""
+        states: Dict[Tuple[str, str], str] = {}
+        out = []
+        for prefix, origin in pairs:
+            key = (prefix, str(origin))
+            state = states.get(key)
+            if state is None:
+                state = states[key] = self.validate(prefix, origin)
+            out.append(state)
+        return out
+
+class RemoteRpkiClient:
+    """
+    Fallback to the RouteViews RPKI API when no local VRP dump is available.
+    Lookups are de-duplicated per batch, issued concurrently and cached for
+    `ttl` seconds, so each prefix is requested at most once per TTL.
+    """
+    def __init__(self, url: str = ROUTEVIEWS_RPKI_URL, ttl: float = 3600, max_workers: int = 16,
+                 timeout: float = 10):
+        self.url = url
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._cache: Dict[str, Tuple[float, Optional[dict]]] = {}
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+
+    def _fetch(self, prefix: str) -> Optional[dict]:
+        try:
+            response = self._session.get(self.url, params={"prefix": prefix}, timeout=self.timeout, verify=False)
+            return response.json().get(prefix)
+        except (requests.RequestException, ValueError):
+            return None
+
+    def lookup_many(self, prefixes: Iterable[str]) -> Dict[str, Optional[dict]]:
+        now = time.monotonic()
+        wanted = set(prefixes)
+        out, missing = {}, []
+        with self._lock:
+            for prefix in wanted:
+                cached = self._cache.get(prefix)
+                if cached is not None and now - cached[0] < self.ttl:
+                    out[prefix] = cached[1]
+                else:
+                    missing.append(prefix)
+        if missing:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                results = dict(zip(missing, pool.map(self._fetch, missing)))
+            with self._lock:
+                for prefix, result in results.items():
+                    self._cache[prefix] = (now, result)
+            out.update(results)
+        return out
+
+    def validate_many(self, pairs: Iterable[Tuple[str, Union[int, str]]]) -> List[str]:
+        """Same states as RpkiValidator.validate_many, derived from the API's answer per prefix."""
+        pairs = list(pairs)
+        responses = self.lookup_many(prefix for prefix, _ in pairs)
+        return [remote_rpki_state(responses.get(prefix), prefix, origin) for prefix, origin in pairs]
+
+def remote_rpki_state(entry: Optional[dict], prefix: str, origin: Union[int, str]) -> str:
+    """
+    "valid" / "invalid" / "not-found" of an announcement from a RouteViews
+    RPKI API entry: its own status if it reports one, otherwise RFC 6811
+    applied to the ROA origins and max length it lists (no entry: not-found).
+    """
+    if not entry:
+        return NOT_FOUND
+    status = entry.get("status", entry.get("state", entry.get("validity")))
+    if isinstance(status, str):
+        status = status.strip().lower().replace("_", "-").replace(" ", "-")
+        if status in (VALID, INVALID):
+            return status
+        if status in (NOT_FOUND, "unknown"):
+            return NOT_FOUND
+    asns = entry.get("origin_asns", entry.get("origin_asn", entry.get("asns", entry.get("asn"))))
+    if asns is None:
+        return NOT_FOUND
+    if not isinstance(asns, (list, tuple, set)):
+        asns = [asns]
+    _, _, length = parse_prefix(prefix)
+    max_length = entry.get("max_length", entry.get("maxLength"))
+    max_length = length if max_length is None else int(max_length)
+    origin = _parse_asn(origin)
+    # AS0 ROAs never validate anything (RFC 6483)
+    if origin and origin in {_parse_asn(asn) for asn in asns} and length <= max_length:
+        return VALID
+    return INVALID
+
+_VALIDATORS: Dict[str, RpkiValidator] = {}
+
+def get_rpki_validator(vrp_path: str = VRP_PATH) -> RpkiValidator:
+    """Return the shared validator for a VRP dump, loading it on first use."""
+    if vrp_path not in _VALIDATORS:
+        _VALIDATORS[vrp_path] = RpkiValidator.from_vrp_file(vrp_path)
+    return _VALIDATORS[vrp_path]